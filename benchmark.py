@@ -0,0 +1,56 @@
+import os
+import sys
+import json
+import platform
+import argparse
+from tetris import benchmark
+
+# Results stored in the repository to compare against by default
+Baseline = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Time the engine and rendering hot paths headless, with fixed seeds.')
+    parser.add_argument('patterns', nargs='*', help='only run benchmarks whose names contain one of these')
+    parser.add_argument('--out', default='benchmark.json', help='write results to this JSON file')
+    parser.add_argument('--baseline', default=Baseline,
+                        help='compare against results saved in this JSON file (default: benchmarks/baseline.json)')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='fraction slower than the baseline that counts as a regression')
+    parser.add_argument('--min-time', type=float, default=benchmark.MinTime,
+                        help='least seconds each timing runs for')
+    return parser.parse_args(argv)
+
+def main(argv):
+
+    args = parse_args(argv)
+    benchmark.MinTime = args.min_time
+    baseline = {}
+    if args.baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    def log(name, result):
+        line = '%-28s %14.1f %s/s' % (name, result['rate'], result['unit'])
+        if name in baseline:
+            line += '  %+6.1f%%' % ((result['rate'] / baseline[name]['rate'] - 1) * 100)
+        print(line)
+        sys.stdout.flush()
+
+    results, skipped = benchmark.run(args.patterns, log)
+    for name, reason in skipped:
+        print('%-28s skipped: %s' % (name, reason))
+
+    with open(args.out, 'w') as f:
+        json.dump({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results
+        }, f, indent=2, sort_keys=True)
+
+    slower = benchmark.regressions(results, baseline, args.threshold)
+    for name, change in slower:
+        print('REGRESSION %s: %.1f%% slower than baseline' % (name, -change * 100))
+    return 1 if slower else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,26 @@
+import os
+import sys
+import argparse
+import pygame
+from tetris import bundle
+from tetris.sound import MixerSettings
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Pack the decoded images and sounds into one asset bundle.')
+    parser.add_argument('--out', default=bundle.BundlePath, help='bundle file to write')
+    return parser.parse_args(argv)
+
+def main(argv):
+
+    args = parse_args(argv)
+
+    # Sounds are decoded for the mixer format the game plays in, which
+    # needs no audio device
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+    pygame.mixer.init(*MixerSettings)
+
+    path = bundle.build(args.out)
+    print('%s: %d bytes' % (path, os.path.getsize(path)))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,21 @@
+import sys
+import argparse
+from tetris.client import run_clients
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Play random keys against a Tetris server from many connections.')
+    parser.add_argument('--host', default='127.0.0.1', help='server TCP address')
+    parser.add_argument('--port', type=int, default=7777, help='server TCP port')
+    parser.add_argument('--unix', metavar='PATH', help='connect to this Unix socket instead')
+    parser.add_argument('--clients', type=int, default=100, help='connections to open')
+    parser.add_argument('--seconds', type=float, default=10, help='seconds to play for')
+    return parser.parse_args(argv)
+
+def main(argv):
+    args = parse_args(argv)
+    address = args.unix or (args.host, args.port)
+    rate, total = run_clients(address, args.clients, args.seconds)
+    print('%d clients received %d states, %.1f per client per second' % (args.clients, total, rate))
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
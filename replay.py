@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+from tetris.engine import Engine
+from tetris.policy import RandomPolicy
+from tetris.replay import Replay, Recorder, final_state, parse_seed
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Play recorded games headless and check they end as recorded.')
+    parser.add_argument('replays', nargs='*', metavar='PATH', help='replay files')
+    parser.add_argument('--record', type=parse_seed, action='append', default=[], metavar='SEED',
+                        help='first record a game of random keys from this seed, saved and loaded again')
+    return parser.parse_args(argv)
+
+# Record a game of random keys from a seed and save it to a new file,
+# returning the file's path
+def record(seed):
+    engine, recorder, policy = Engine(), Recorder(), RandomPolicy()
+    engine.attach(recorder)
+    engine.reset(seed)
+    policy.reset(engine, seed)
+    while engine.running:
+        engine.step(policy.act(engine))
+    handle, path = tempfile.mkstemp('.rpl')
+    os.close(handle)
+    recorder.finish().save(path)
+    return path
+
+def main(argv):
+
+    args = parse_args(argv)
+    recorded = [record(seed) for seed in args.record]
+    failed = 0
+    for path in args.replays + recorded:
+        replay = Replay.load(path)
+        start = time.time()
+        engine = replay.play()
+        elapsed = time.time() - start
+
+        ok = replay.matches(engine)
+        failed += not ok
+        print('%s: %s, seed %d, %d ticks in %.3fs (%.0f ticks/s), score %d lines %d level %d pieces %d' % (
+            path, 'ok' if ok else 'MISMATCH', replay.seed, replay.ticks, elapsed,
+            replay.ticks / max(elapsed, 1e-6), engine.stats.score, engine.stats.lines,
+            engine.stats.level, engine.stats.pieces))
+        if not ok:
+            print('  expected %r, got %r' % (tuple(replay.state), final_state(engine)))
+    for path in recorded:
+        os.remove(path)
+
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
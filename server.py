@@ -0,0 +1,44 @@
+import sys
+import argparse
+from tetris.engine import TickRate
+from tetris.server import Server, capacity
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Host headless Tetris sessions over TCP or a Unix socket.')
+    parser.add_argument('--host', default='127.0.0.1', help='TCP address to listen on')
+    parser.add_argument('--port', type=int, default=7777, help='TCP port to listen on, 0 for none')
+    parser.add_argument('--unix', metavar='PATH', help='also listen on this Unix socket')
+    parser.add_argument('--capacity', type=int, metavar='SESSIONS', nargs='?', const=500,
+                        help='estimate the sessions one core sustains at the tick rate and exit')
+    return parser.parse_args(argv)
+
+def main(argv):
+
+    args = parse_args(argv)
+    if args.capacity:
+        sessions, cost = capacity(args.capacity)
+        print('%.1f us per session tick: about %d sessions per core at %d Hz' % (cost * 1e6, sessions, TickRate))
+        return
+
+    server = Server()
+    if args.port:
+        print('listening on %s:%d' % server.listen_tcp(args.host, args.port))
+    if args.unix:
+        print('listening on %s' % server.listen_unix(args.unix))
+
+    # Report the load every few seconds
+    try:
+        while True:
+            ticks, busy = server.tick, server.busy
+            server.run(5)
+            ticks = server.tick - ticks
+            print('%d sessions, %d ticks, %.1f%% busy, %d overruns' % (
+                len(server.sessions), ticks, (server.busy - busy) / 5 * 100, server.overruns))
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,66 @@
+import sys
+import json
+import time
+import argparse
+from tetris.engine import GridSize, parse_gravity
+from tetris.selfplay import Policies, run_games, Summary
+from tetris import telemetry
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Play seeded headless games across worker processes.')
+    parser.add_argument('--games', type=int, default=1000, help='number of games to play')
+    parser.add_argument('--policy', choices=sorted(Policies), default='random', help='policy playing the games')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the first game, later games count up')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--batch', type=int, default=16, help='games sent to a worker at a time')
+    parser.add_argument('--max-ticks', type=int, default=None, help='stop games after this many ticks')
+    parser.add_argument('--width', type=int, default=GridSize.width, help='grid columns')
+    parser.add_argument('--height', type=int, default=GridSize.height, help='grid rows')
+    parser.add_argument('--gravity', type=parse_gravity, default=None, metavar='ROWS',
+                        help="rows per tick at every level, such as 20 or 1/4, or 'high' for levels past 1 row a tick")
+    parser.add_argument('--lock-delay', type=int, default=None, metavar='TICKS',
+                        help='ticks a landed piece waits before locking')
+    parser.add_argument('--encode', action='store_true', help='encode each game with the codec, report its size and check it decodes')
+    parser.add_argument('--telemetry', metavar='PATH',
+                        help='log piece events and game summaries, one file per worker named after PATH')
+    parser.add_argument('--columnar', action='store_true', help='log telemetry as columns of each batch')
+    parser.add_argument('--rotate', type=float, default=telemetry.MaxBytes / 1024.0 / 1024.0, metavar='MB',
+                        help='rotate telemetry logs at this size')
+    parser.add_argument('--out', help='write each game result to this file as a JSON line')
+    return parser.parse_args(argv)
+
+def main(argv):
+
+    args = parse_args(argv)
+    summary = Summary()
+    out = open(args.out, 'w') if args.out else None
+    seeds = xrange(args.seed, args.seed + args.games)
+    logging = None
+    if args.telemetry:
+        logging = (args.telemetry, 'columnar' if args.columnar else 'jsonl', int(args.rotate * 1024 * 1024))
+
+    start = time.time()
+    try:
+        for results in run_games(seeds, args.policy, args.workers, args.batch, args.max_ticks,
+                                 args.width, args.height, args.encode, logging,
+                                 args.gravity, args.lock_delay):
+            for result in results:
+                summary.add(result)
+                if out:
+                    out.write(json.dumps(result, sort_keys=True) + '\n')
+            sys.stderr.write('\r%d/%d games' % (summary.count(), args.games))
+    finally:
+        if out:
+            out.close()
+    elapsed = time.time() - start
+
+    sys.stderr.write('\n')
+    print(summary.report())
+    print('%d games in %.2fs (%.1f games/s)' % (summary.count(), elapsed, summary.count() / elapsed))
+    failed = summary.values.get('decoded', []).count(0)
+    if failed:
+        sys.stderr.write('%d games did not decode to their final state\n' % failed)
+        return 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
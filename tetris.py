@@ -1,14 +1,72 @@
+import time
+started = time.time()
+
 import os
 import sys
+import argparse
 import pygame
 from tetris.core import Core
+from tetris.bot import Bot
+from tetris.assets import Loader
+from tetris.replay import Replay, Playback, parse_seed
+from tetris.telemetry import Telemetry, Writer
+from tetris.sound import MixerSettings
+from tetris.controls import Controls, AutoShiftDelay, AutoRepeatRate
 from tetris.util import ScreenSize
+from tetris.engine import GridSize, parse_gravity
 
-os.environ['SDL_VIDEO_CENTERED'] = '1'
-pygame.mixer.pre_init(44100, -16, 2, 4096)
-pygame.init()
-gfx = pygame.display.set_mode(ScreenSize)
-pygame.display.set_caption('Tetris')
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Play Tetris.')
+    parser.add_argument('--bot', action='store_true', help='let the bot play')
+    parser.add_argument('--width', type=int, default=GridSize.width, help='grid columns')
+    parser.add_argument('--height', type=int, default=GridSize.height, help='grid rows')
+    parser.add_argument('--gravity', type=parse_gravity, default=None, metavar='ROWS',
+                        help="rows per tick at every level, such as 20 or 1/4, or 'high' for levels past 1 row a tick")
+    parser.add_argument('--lock-delay', type=int, default=None, metavar='TICKS',
+                        help='ticks a landed piece waits before locking')
+    parser.add_argument('--seed', type=parse_seed, default=None, help='seed every game with this')
+    parser.add_argument('--record', metavar='PATH', help='save the replay of each game to this file')
+    parser.add_argument('--replay', metavar='PATH', help='watch a recorded game')
+    parser.add_argument('--mute', action='store_true', help='play without sound')
+    parser.add_argument('--das', type=float, default=AutoShiftDelay * 1000,
+                        help='milliseconds a shift key is held before it repeats')
+    parser.add_argument('--arr', type=float, default=AutoRepeatRate * 1000,
+                        help='milliseconds between shift repeats')
+    parser.add_argument('--latency', action='store_true', help='report input latency after each game')
+    parser.add_argument('--rewind', type=float, default=0, metavar='SECONDS',
+                        help='keep this many seconds of play to rewind by holding backspace')
+    parser.add_argument('--telemetry', metavar='PATH', help='log piece events and game summaries to this file')
+    parser.add_argument('--columnar', action='store_true', help='log telemetry as columns of each batch')
+    parser.add_argument('--profile', metavar='CSV', help='save frame timings to this file on exit (F3 shows them)')
+    parser.add_argument('--timing', action='store_true', help='log startup timings to stderr')
+    return parser.parse_args(argv)
 
 if __name__ == '__main__':
-    Core(gfx).run()
+
+    args = parse_args(sys.argv[1:])
+    loader = Loader(log=args.timing, start=started)
+    loader.mark('modules imported')
+
+    os.environ['SDL_VIDEO_CENTERED'] = '1'
+    pygame.mixer.pre_init(*MixerSettings)
+    pygame.init()
+    gfx = pygame.display.set_mode(ScreenSize)
+    pygame.display.set_caption('Tetris')
+    loader.mark('display opened')
+
+    policy, seed = (Bot() if args.bot else None), args.seed
+    width, height = args.width, args.height
+    gravity, lock_delay = args.gravity, args.lock_delay
+    if args.replay:
+        replay = Replay.load(args.replay)
+        policy, seed = Playback(replay), replay.seed
+        width, height = replay.width, replay.height
+        gravity, lock_delay = replay.gravity, replay.lock_delay
+    controls = Controls(args.das / 1000.0, args.arr / 1000.0)
+    telemetry = None
+    if args.telemetry:
+        telemetry = Telemetry(Writer(args.telemetry, 'columnar' if args.columnar else 'jsonl'))
+    Core(gfx, policy=policy, seed=seed, record=args.record, loader=loader,
+         muted=args.mute, controls=controls, latency=args.latency,
+         profile=args.profile, width=width, height=height, rewind=args.rewind,
+         telemetry=telemetry, gravity=gravity, lock_delay=lock_delay).run()
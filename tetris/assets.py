@@ -0,0 +1,77 @@
+import sys
+import time
+import Queue
+import threading
+
+# An asset being loaded. Whoever asks for it first loads it, the loader's
+# thread or a caller of get, and everyone else waits for that load.
+class Pending(object):
+
+    def __init__(self, loader, name, load, args):
+        self.loader = loader
+        self.name = name
+        self.load = load
+        self.args = args
+        self.lock = threading.Lock()
+        self.done = False
+        self.value = None
+        self.error = None
+
+    def run(self):
+        with self.lock:
+            if self.done:
+                return
+            start = time.time()
+            try:
+                self.value = self.load(*self.args)
+            except Exception:
+                self.error = sys.exc_info()
+            self.done = True
+            self.loader.loaded(self, time.time() - start)
+
+    # The loaded asset, loading it now if no one has yet
+    def get(self):
+        if not self.done:
+            self.run()
+        if self.error:
+            raise self.error[0], self.error[1], self.error[2]
+        return self.value
+
+# Loads assets in the order they are asked for on a background thread, so
+# startup only waits for the assets it uses first. Without the thread,
+# assets load the first time they are used. Also keeps startup timings,
+# logging them to stderr if asked to.
+class Loader(object):
+
+    def __init__(self, threaded=True, log=False, start=None):
+        self.start = start if start is not None else time.time()
+        self.log = log
+        self.timings = []
+        self.queue = Queue.Queue()
+        self.thread = None
+        if threaded:
+            self.thread = threading.Thread(target=self.work, name='asset loader')
+            self.thread.daemon = True
+            self.thread.start()
+
+    # Start loading an asset, returning its Pending
+    def submit(self, name, load, *args):
+        pending = Pending(self, name, load, args)
+        if self.thread:
+            self.queue.put(pending)
+        return pending
+
+    def work(self):
+        while True:
+            self.queue.get().run()
+
+    def loaded(self, pending, duration):
+        where = 'in background' if threading.current_thread() is self.thread else 'on demand'
+        self.mark('loaded %s %s (%.1f ms)' % (pending.name, where, duration * 1000))
+
+    # Note an event in the startup timings
+    def mark(self, event):
+        elapsed = time.time() - self.start
+        self.timings.append((event, elapsed))
+        if self.log:
+            sys.stderr.write('%8.1f ms  %s\n' % (elapsed * 1000, event))
@@ -0,0 +1,231 @@
+import numpy as np
+from tetris.board import Pad
+from tetris.piece import Shapes
+from tetris.engine import GridSize, Statistics
+
+# Per rotation tables, one row for each shape and rotation at index
+# (shape * 4 + rotation) and one column per entry. Every piece has four
+# cells. Column profiles list the top and bottom row of each occupied
+# column, padded to four entries by repeating a column. Row masks list each
+# occupied row's bitmask, padded with unused empty rows.
+class Tables(object):
+
+    def __init__(self, shapes):
+
+        count = len(shapes) * 4
+        self.cell_x = np.zeros((count, 4), np.int64)
+        self.cell_y = np.zeros((count, 4), np.int64)
+        self.values = np.zeros((count, 4), np.uint8)
+        self.column_x = np.zeros((count, 4), np.int64)
+        self.column_top = np.zeros((count, 4), np.int64)
+        self.column_bottom = np.zeros((count, 4), np.int64)
+        self.row_y = np.zeros((count, 4), np.int64)
+        self.row_mask = np.zeros((count, 4), np.int64)
+        self.row_used = np.zeros((count, 4), bool)
+        self.origin_x = np.zeros(count, np.int64)
+
+        for s, shape in enumerate(shapes):
+            for r, state in enumerate(shape.rotations):
+                k = s * 4 + r
+                columns = {}
+                for c, (x, y, value) in enumerate(state.cells):
+                    self.cell_x[k, c] = x
+                    self.cell_y[k, c] = y
+                    self.values[k, c] = value
+                    top, bottom = columns.get(x, (y, y))
+                    columns[x] = (min(top, y), max(bottom, y))
+                profile = sorted(columns.items())
+                profile += [profile[0]] * (4 - len(profile))
+                for c, (x, (top, bottom)) in enumerate(profile):
+                    self.column_x[k, c] = x
+                    self.column_top[k, c] = top
+                    self.column_bottom[k, c] = bottom
+                for c, (y, mask) in enumerate(state.masks):
+                    self.row_y[k, c] = y
+                    self.row_mask[k, c] = mask
+                    self.row_used[k, c] = True
+                self.origin_x[k] = state.origin.x
+
+# Many independent games advanced in lockstep, one placement per game per
+# step, with every rule applied as an array operation across all boards.
+# Games use the piece set of tetris.piece and the scoring of Statistics,
+# with hard drops from above. Pieces come from a numpy generator, so games
+# match the single engine's rules and distributions, not its exact sequences.
+class BatchEngine(object):
+
+    def __init__(self, n, seed=None, width=GridSize.width, height=GridSize.height):
+
+        if width + Pad > 62:
+            raise ValueError("Batch boards are at most %d columns wide" % (62 - Pad))
+
+        self.n = n
+        self.width = width
+        self.height = height
+        self.random = np.random.RandomState(seed)
+        self.index = np.arange(n)
+
+        # Row bits sit Pad bits up, as on Board, so shifts stay positive
+        self.full = ((1 << width) - 1) << Pad
+
+        self.tables = Tables(Shapes)
+        # Spawn points, centred on the grid as Engine.spawn does
+        offset = (width - GridSize.width) / 2
+        self.spawn_x = np.array([shape.spawn.x + offset for shape in Shapes], np.int64)
+        self.spawn_y = np.array([shape.spawn.y for shape in Shapes], np.int64)
+        self.scores = np.array([Statistics.Scores[i] for i in xrange(5)], np.int64)
+
+        # Column range where each rotation stays within the walls
+        self.min_x = -self.tables.cell_x.min(axis=1)
+        self.max_x = width - 1 - self.tables.cell_x.max(axis=1)
+
+        self.reset()
+
+    # Start every game over, reseeding the piece generator if a seed is given.
+    def reset(self, seed=None):
+        if seed is not None:
+            self.random.seed(seed)
+        n, width, height = self.n, self.width, self.height
+
+        # Boards hold block values and rows hold a bitmask per row, both as
+        # views of flat buffers so they can be read and written by flat
+        # index. The last entry of each buffer is a scratch slot standing in
+        # for cells above the top.
+        self.cell_buffer = np.zeros(n * height * width + 1, np.uint8)
+        self.row_buffer = np.zeros(n * height + 1, np.int64)
+        self.cell_scratch = n * height * width
+        self.row_scratch = n * height
+        self.boards = self.cell_buffer[:-1].reshape(n, height, width)
+        self.rows = self.row_buffer[:-1].reshape(n, height)
+
+        self.tops = np.full((n, width), height, np.int64)
+        self.curr = self.random.randint(len(Shapes), size=n)
+        self.next = self.random.randint(len(Shapes), size=n)
+        self.score = np.zeros(n, np.int64)
+        self.lines = np.zeros(n, np.int64)
+        self.level = np.zeros(n, np.int64)
+        self.pieces = np.zeros(n, np.int64)
+        self.done = np.zeros(n, bool)
+
+    # Start finished games over, leaving the others running.
+    def restart_done(self):
+        ids = np.flatnonzero(self.done)
+        if not len(ids):
+            return
+        self.boards[ids] = 0
+        self.rows[ids] = 0
+        self.tops[ids] = self.height
+        self.curr[ids] = self.random.randint(len(Shapes), size=len(ids))
+        self.next[ids] = self.random.randint(len(Shapes), size=len(ids))
+        for stat in (self.score, self.lines, self.level, self.pieces):
+            stat[ids] = 0
+        self.done[ids] = False
+
+    # Flat row buffer index of each piece row of rotation k at row y on the
+    # given boards, with rows above the top and padding sent to scratch.
+    def row_index(self, boards, k, y):
+        rows = y[:, None] + self.tables.row_y.take(k, axis=0)
+        used = (rows >= 0) & self.tables.row_used.take(k, axis=0)
+        return np.where(used, boards[:, None] * self.height + rows, self.row_scratch)
+
+    # Row masks of rotation k shifted to column x.
+    def row_masks(self, k, x):
+        return self.tables.row_mask.take(k, axis=0) << (x[:, None] + Pad)
+
+    # Check which boards a rotation of their current piece at [x,y] would
+    # overlap walls, floor or blocks. Cells above the top never collide.
+    def collides(self, rotations, xs, ys):
+        k = self.curr * 4 + (rotations & 3)
+        walls = (xs < self.min_x.take(k)) | (xs > self.max_x.take(k))
+        floor = (ys[:, None] + self.tables.cell_y.take(k, axis=0) >= self.height).any(axis=1)
+        blocked = walls | floor
+        rows = self.row_index(self.index, k, np.where(blocked, -self.height, ys))
+        masks = self.row_masks(k, np.where(blocked, 0, xs))
+        return blocked | ((self.row_buffer.take(rows) & masks) != 0).any(axis=1)
+
+    # Random rotation and in-bounds column for each board's current piece.
+    def random_placements(self):
+        rotations = self.random.randint(4, size=self.n)
+        k = self.curr * 4 + rotations
+        low, high = self.min_x.take(k), self.max_x.take(k)
+        columns = low + (self.random.random_sample(self.n) * (high - low + 1)).astype(np.int64)
+        return rotations, columns
+
+    # Hard drop each live board's current piece with the given rotation at
+    # the given column, clamped inside the walls, lock it and clear lines.
+    # Returns the number of lines each board cleared.
+    def place(self, rotations, columns):
+
+        tables = self.tables
+        width, height = self.width, self.height
+        live = np.flatnonzero(~self.done)
+        cleared = np.zeros(self.n, np.int64)
+        if not len(live):
+            return cleared
+
+        k = self.curr[live] * 4 + (rotations[live] & 3)
+        x = np.clip(columns[live], self.min_x.take(k), self.max_x.take(k))
+
+        # Landing row from column tops against the bottom profile
+        columns = live[:, None] * width + x[:, None] + tables.column_x.take(k, axis=0)
+        tops = self.tops.reshape(-1).take(columns)
+        y = (tops - 1 - tables.column_bottom.take(k, axis=0)).min(axis=1)
+
+        # Locking with the piece's left edge at the top ends the game
+        lockout = y + tables.origin_x.take(k) <= 0
+        if lockout.any():
+            self.done[live[lockout]] = True
+            keep = ~lockout
+            live, k, x, y = live[keep], k[keep], x[keep], y[keep]
+            columns, tops = columns[keep], tops[keep]
+
+        # Set row bits and count the rows the pieces filled. A piece's rows
+        # are distinct, so no two writes land on the same row.
+        rows = self.row_index(live, k, y)
+        self.row_buffer[rows] |= self.row_masks(k, x)
+        self.row_buffer[self.row_scratch] = 0
+        counts = (self.row_buffer.take(rows) == self.full).sum(axis=1)
+
+        # Write block values
+        cell_y = y[:, None] + tables.cell_y.take(k, axis=0)
+        cells = (live[:, None] * height + cell_y) * width + x[:, None] + tables.cell_x.take(k, axis=0)
+        self.cell_buffer[np.where(cell_y >= 0, cells, self.cell_scratch)] = tables.values.take(k, axis=0)
+        self.cell_buffer[self.cell_scratch] = 0
+
+        # Raise the tops of columns with visible cells
+        raised = np.minimum(tops, np.maximum(y[:, None] + tables.column_top.take(k, axis=0), 0))
+        visible = y[:, None] + tables.column_bottom.take(k, axis=0) >= 0
+        self.tops.reshape(-1)[columns] = np.where(visible, raised, tops)
+
+        # Clear full rows, compacting the remaining rows to the bottom
+        clearing = counts > 0
+        if clearing.any():
+            ids = live[clearing]
+            full = self.rows[ids] == self.full
+            order = np.argsort(~full, axis=1, kind='mergesort')
+            emptied = np.arange(height)[None, :] < counts[clearing][:, None]
+            boards = self.boards[ids[:, None], order]
+            boards[emptied] = 0
+            rows = self.rows[ids[:, None], order]
+            rows[emptied] = 0
+            self.boards[ids] = boards
+            self.rows[ids] = rows
+            filled = boards != 0
+            self.tops[ids] = np.where(filled.any(axis=1), filled.argmax(axis=1), height)
+
+        # Update statistics, levelling up at most once per placement
+        cleared[live] = counts
+        self.score[live] += self.scores.take(counts)
+        self.lines[live] += counts
+        self.level[live] += self.lines[live] // 10 > self.level[live]
+        self.pieces[live] += 1
+
+        # Promote next pieces, ending games where the new piece can't spawn
+        self.curr[live] = self.next[live]
+        self.next[live] = self.random.randint(len(Shapes), size=len(live))
+        k = self.curr[live] * 4
+        rows = self.row_index(live, k, self.spawn_y.take(self.curr[live]))
+        masks = self.row_masks(k, self.spawn_x.take(self.curr[live]))
+        blocked = ((self.row_buffer.take(rows) & masks) != 0).any(axis=1)
+        self.done[live[blocked]] = True
+
+        return cleared
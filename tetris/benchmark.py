@@ -0,0 +1,332 @@
+import os
+import time
+import random
+from tetris.engine import Engine, GridSize
+from tetris.piece import Piece, IShape, TShape
+from tetris.policy import RandomPolicy
+from tetris.bot import Bot
+from tetris.selfplay import play_game
+from tetris.codec import Encoder, Decoder
+from tetris.telemetry import Telemetry, Writer
+
+# Seed every benchmark starts from
+Seed = 1
+
+# Each timing runs for at least MinTime seconds and is repeated Repeats
+# times, keeping the fastest
+MinTime = 0.2
+Repeats = 5
+
+# Seconds per run of op, best of Repeats, with enough runs to last MinTime.
+# When reset is given it runs before every op and its own cost is taken out.
+def seconds_per_op(op, reset=None):
+
+    def run(n):
+        if reset:
+            start = time.time()
+            for i in xrange(n):
+                reset()
+                op()
+            elapsed = time.time() - start
+            start = time.time()
+            for i in xrange(n):
+                reset()
+            return elapsed - (time.time() - start)
+        start = time.time()
+        for i in xrange(n):
+            op()
+        return time.time() - start
+
+    n = 1
+    while True:
+        start = time.time()
+        run(n)
+        if time.time() - start >= MinTime / Repeats:
+            break
+        n *= 2
+    return max(1e-12, min(run(n) for i in xrange(Repeats))) / n
+
+# An engine partway into a game, with a bot-built stack
+def midgame(pieces=40):
+    engine = Engine()
+    bot = Bot()
+    engine.reset(Seed)
+    bot.reset(engine, Seed)
+    while engine.running and engine.stats.pieces < pieces:
+        engine.step(bot.act(engine))
+    return engine
+
+# Lock a rotation of a shape into an engine's grid and board with its
+# top-left cell at [x,y], without clearing rows
+def lock_at(engine, shape, rotation, x, y):
+    piece = Piece(shape)
+    piece.rotation = rotation
+    cells = piece.state.cells
+    piece.x = x - min(cx for cx, cy, v in cells)
+    piece.y = y - min(cy for cx, cy, v in cells)
+    engine.set_grid_piece(piece)
+    engine.board.lock(piece.state, piece.x, piece.y)
+    return piece
+
+def bench_valid_move():
+    engine = midgame()
+    piece = engine.curr_piece
+    return seconds_per_op(lambda: engine.valid_move(piece))
+
+# Gravity moving the current piece down to just above its landing row
+def bench_drop_piece():
+    engine = midgame()
+    piece = engine.curr_piece
+    top, rows = piece.y, engine.ghost_y - piece.y
+
+    def reset():
+        piece.y = top
+    return seconds_per_op(lambda: engine.drop_piece(rows), reset) / max(1, rows)
+
+# Locking a vertical I into the gap of four full rows, clearing all four
+def bench_place_piece():
+    engine = Engine()
+    engine.reset(Seed)
+    bottom = GridSize.height - 4
+    for y in xrange(bottom, GridSize.height):
+        lock_at(engine, IShape, 0, 1, y)
+        lock_at(engine, IShape, 0, 5, y)
+    lock_at(engine, IShape, 1, GridSize.width - 1, bottom)
+    board, grid = engine.board.copy(), [column[:] for column in engine.grid]
+    piece = Piece(IShape)
+
+    def reset():
+        engine.board = board.copy()
+        engine.grid = [column[:] for column in grid]
+        piece.spawn(IShape)
+        piece.rotation = 1
+        piece.x = -min(cx for cx, cy, v in piece.state.cells)
+        piece.y = bottom - min(cy for cx, cy, v in piece.state.cells)
+    return seconds_per_op(lambda: engine.place_piece(piece), reset)
+
+def bench_set_grid_piece():
+    engine = midgame()
+    piece = engine.curr_piece
+    return seconds_per_op(lambda: engine.set_grid_piece(piece))
+
+def bench_remove_grid_rows():
+    engine = midgame()
+    rows = range(GridSize.height - 4, GridSize.height)
+    return seconds_per_op(lambda: engine.remove_grid_rows(rows))
+
+def bench_snapshot():
+    engine = midgame()
+    snapshot = engine.snapshot()
+    return seconds_per_op(lambda: engine.snapshot(snapshot))
+
+# Going back to a snapshot from before the last piece locked
+def bench_restore():
+    engine = midgame()
+    snapshot = engine.snapshot()
+    engine.hard_drop()
+    return seconds_per_op(lambda: engine.restore(snapshot))
+
+def bench_rotate_left():
+    piece = Piece(TShape)
+    return seconds_per_op(piece.rotate_left)
+
+def bench_rotate_right():
+    piece = Piece(TShape)
+    return seconds_per_op(piece.rotate_right)
+
+def bench_update_ghost():
+    engine = midgame()
+    return seconds_per_op(engine.update_ghost)
+
+# Seconds per piece over whole seeded games played by a policy
+def game_throughput(policy, games, max_ticks=None):
+    engine = Engine()
+    start = time.time()
+    pieces = 0
+    for seed in xrange(Seed, Seed + games):
+        pieces += play_game(engine, policy, seed, max_ticks)['pieces']
+    return (time.time() - start) / max(1, pieces)
+
+def bench_game_random():
+    return game_throughput(RandomPolicy(), 20)
+
+def bench_game_bot():
+    return game_throughput(Bot(), 1, 5000)
+
+# The actions of a bot game, stepped again by the codec benchmarks. The bot
+# moves and locks pieces far more often than a person, so its stream is
+# about the busiest there is to encode.
+def bot_actions(ticks=3000):
+    engine = Engine()
+    bot = Bot()
+    engine.reset(Seed)
+    bot.reset(engine, Seed)
+    actions = []
+    while engine.running and len(actions) < ticks:
+        actions.append(bot.act(engine))
+        engine.step(actions[-1])
+    return actions
+
+# Encoding cost per tick. The engine steps untimed between the encoder's
+# calls, so only the encoder's own time is counted.
+def bench_codec_encode():
+    actions = bot_actions()
+    engine = Engine()
+    encoder = Encoder()
+    engine.attach(encoder)
+    spent = [0.0]
+    on_lock = encoder.on_lock
+
+    def timed_lock(engine, cleared):
+        start = time.time()
+        on_lock(engine, cleared)
+        spent[0] += time.time() - start
+    encoder.on_lock = timed_lock
+
+    def encode():
+        spent[0] = 0.0
+        engine.reset(Seed)
+        for a in actions:
+            engine.step(a)
+            start = time.time()
+            encoder.tick(engine)
+            spent[0] += time.time() - start
+        encoder.take()
+        return spent[0]
+    return min(encode() for i in xrange(Repeats)) / len(actions)
+
+def bench_codec_decode():
+    actions = bot_actions()
+    engine = Engine()
+    encoder = Encoder()
+    engine.attach(encoder)
+    engine.reset(Seed)
+    for a in actions:
+        engine.step(a)
+        encoder.tick(engine)
+    data = encoder.finish()
+
+    def decode():
+        decoder = Decoder(data)
+        while decoder.step():
+            pass
+    return seconds_per_op(decode) / len(actions)
+
+# Recording a piece event, with the writer thread turning batches into
+# lines for the null device as it would for a log
+def bench_telemetry_lock():
+    engine = midgame()
+    telemetry = Telemetry(Writer(os.devnull))
+    telemetry.on_start(engine)
+    try:
+        return seconds_per_op(lambda: telemetry.on_lock(engine, 0))
+    finally:
+        telemetry.close()
+
+# Random placements on 1000 boards at once, per placement
+def bench_batch_place():
+    from tetris.batch import BatchEngine
+    batch = BatchEngine(1000, Seed)
+
+    def op():
+        batch.place(*batch.random_placements())
+        batch.restart_done()
+    return seconds_per_op(op) / batch.n
+
+# A window on SDL's dummy drivers, a gallery and a game partway in
+def headless_game():
+    os.environ['SDL_VIDEODRIVER'] = 'dummy'
+    os.environ['SDL_AUDIODRIVER'] = 'dummy'
+    import pygame
+    from tetris.game import Tetris
+    from tetris.image import Gallery
+    from tetris.util import ScreenSize
+    pygame.init()
+    gfx = pygame.display.set_mode(ScreenSize)
+    gallery = Gallery()
+    game = Tetris()
+    game.mixer.mute()
+    game.new_game(Seed)
+    bot = Bot()
+    bot.reset(game, Seed)
+    while game.running and game.stats.pieces < 40:
+        game.step(bot.act(game))
+    return gfx, gallery, game
+
+def bench_render_game():
+    gfx, gallery, game = headless_game()
+    return seconds_per_op(lambda: game.render(gfx, gallery))
+
+# A dirty frame with the piece moving one column each frame
+def bench_render_dirty():
+    gfx, gallery, game = headless_game()
+    game.render(gfx, gallery)
+    moves = [1]
+
+    def op():
+        x = game.curr_piece.x
+        game.shift(moves[0])
+        if game.curr_piece.x == x:
+            moves[0] = -moves[0]
+        game.render_dirty(gfx, gallery)
+    return seconds_per_op(op)
+
+def bench_render_menu():
+    from tetris.core import Menu
+    gfx, gallery, game = headless_game()
+    menu = Menu()
+    return seconds_per_op(lambda: menu.render(gfx, gallery))
+
+# Benchmarks by name, with the unit they count per second
+Benchmarks = (
+    ('engine.valid_move', 'calls', bench_valid_move),
+    ('engine.drop_piece', 'rows', bench_drop_piece),
+    ('engine.place_piece.tetris', 'calls', bench_place_piece),
+    ('engine.set_grid_piece', 'calls', bench_set_grid_piece),
+    ('engine.remove_grid_rows', 'calls', bench_remove_grid_rows),
+    ('engine.update_ghost', 'calls', bench_update_ghost),
+    ('engine.snapshot', 'calls', bench_snapshot),
+    ('engine.restore', 'calls', bench_restore),
+    ('piece.rotate_left', 'calls', bench_rotate_left),
+    ('piece.rotate_right', 'calls', bench_rotate_right),
+    ('game.random', 'pieces', bench_game_random),
+    ('game.bot', 'pieces', bench_game_bot),
+    ('codec.encode', 'ticks', bench_codec_encode),
+    ('codec.decode', 'ticks', bench_codec_decode),
+    ('telemetry.lock', 'calls', bench_telemetry_lock),
+    ('batch.place', 'placements', bench_batch_place),
+    ('render.game', 'frames', bench_render_game),
+    ('render.dirty', 'frames', bench_render_dirty),
+    ('render.menu', 'frames', bench_render_menu)
+)
+
+# Run the benchmarks whose names contain any of the patterns, or all of
+# them. Returns {name: {'rate': per second, 'unit': unit}} and the names
+# skipped for a missing optional module such as numpy or pygame.
+def run(patterns=None, log=None):
+
+    results, skipped = {}, []
+    for name, unit, bench in Benchmarks:
+        if patterns and not any(p in name for p in patterns):
+            continue
+        random.seed(Seed)
+        try:
+            seconds = bench()
+        except ImportError as e:
+            skipped.append((name, str(e)))
+            continue
+        results[name] = {'rate': 1.0 / seconds, 'unit': unit}
+        if log:
+            log(name, results[name])
+    return results, skipped
+
+# Names of results slower than the baseline by more than the threshold, a
+# fraction of the baseline rate, with each one's change
+def regressions(results, baseline, threshold):
+    slower = []
+    for name, result in sorted(results.iteritems()):
+        if name in baseline:
+            change = result['rate'] / baseline[name]['rate'] - 1
+            if change < -threshold:
+                slower.append((name, change))
+    return slower
@@ -0,0 +1,150 @@
+# Number of wall bits padding each side of a board row. Must cover the
+# widest piece grid so shifted piece masks never go negative in bounds.
+Pad = 5
+
+# Grid cells packed as one integer bitmask per row. Column x maps to bit
+# (x + Pad) and the padding bits are set, so walls collide like blocks.
+# Alongside the rows the board keeps an index of the stack shape, updated
+# as pieces lock: fill counts per row, plus top row and fill count per column.
+class Board(object):
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.walls = ((1 << Pad) - 1) | (((1 << Pad) - 1) << (Pad + width))
+        self.solid = (1 << (width + Pad * 2)) - 1
+        self.clear()
+
+    def clear(self):
+        self.rows = [self.walls] * self.height
+        self.counts = [0] * self.height
+        self.tops = [self.height] * self.width
+        self.column_counts = [0] * self.width
+
+    # Independent copy, for trying placements without touching this board.
+    def copy(self):
+        board = Board.__new__(Board)
+        board.width = self.width
+        board.height = self.height
+        board.walls = self.walls
+        board.solid = self.solid
+        board.rows = self.rows[:]
+        board.counts = self.counts[:]
+        board.tops = self.tops[:]
+        board.column_counts = self.column_counts[:]
+        return board
+
+    # Number of filled cells in row y.
+    def row_count(self, y):
+        return self.counts[y]
+
+    # Height of the stack in column x.
+    def column_height(self, x):
+        return self.height - self.tops[x]
+
+    # Number of empty cells below the top of column x.
+    def column_holes(self, x):
+        return self.height - self.tops[x] - self.column_counts[x]
+
+    # Stack height of every column, left to right.
+    def heights(self):
+        return tuple(self.height - top for top in self.tops)
+
+    # Total number of holes across all columns.
+    def holes(self):
+        return (self.height * self.width) - sum(self.tops) - sum(self.column_counts)
+
+    # Height of the tallest column.
+    def stack_height(self):
+        return self.height - min(self.tops)
+
+    # Check if a rotation placed at [x,y] overlaps walls, floor or blocks.
+    # Rows above the top never collide, as pieces spawn there.
+    def collides(self, state, x, y):
+        shift = x + Pad
+        if shift < 0:
+            return True
+        rows = self.rows
+        height = self.height
+        for dy, mask in state.masks:
+            row = y + dy
+            if row < 0:
+                continue
+            if row >= height or rows[row] & (mask << shift):
+                return True
+        return False
+
+    # Number of rows a rotation at [x,y] can fall before landing. Reads the
+    # column tops against the rotation's bottom profile, and only steps row
+    # by row when the piece is tucked under an overhang.
+    def drop_distance(self, state, x, y):
+        tops = self.tops
+        distance = self.height - y
+        for dx, dy in state.bottoms:
+            fall = tops[x + dx] - 1 - (y + dy)
+            if fall < distance:
+                distance = fall
+        if distance < 0:
+            distance = 0
+            while not self.collides(state, x, y + distance + 1):
+                distance += 1
+        return distance
+
+    # Lock a rotation at [x,y], then remove full rows. Only rows the piece
+    # touched can fill, and the remaining rows are compacted in one pass.
+    # Returns the indices of the cleared rows, top to bottom, as they were
+    # before removal.
+    def lock(self, state, x, y):
+        shift = x + Pad
+        rows = self.rows
+        counts = self.counts
+        tops = self.tops
+        column_counts = self.column_counts
+        for dy, mask in state.masks:
+            if y + dy >= 0:
+                rows[y + dy] |= mask << shift
+
+        cleared = []
+        for dx, dy, value in state.cells:
+            row = y + dy
+            if row >= 0:
+                counts[row] += 1
+                column_counts[x + dx] += 1
+                if row < tops[x + dx]:
+                    tops[x + dx] = row
+                if counts[row] == self.width:
+                    cleared.append(row)
+
+        if cleared:
+            cleared.sort()
+            n = len(cleared)
+            keep = [row for row in xrange(self.height) if counts[row] != self.width]
+            self.rows = [self.walls] * n + [rows[row] for row in keep]
+            self.counts = [0] * n + [counts[row] for row in keep]
+            for col in xrange(self.width):
+                column_counts[col] -= n
+            self.find_tops()
+        return cleared
+
+    # Recompute column tops, scanning down only until every non-empty column
+    # is found.
+    def find_tops(self):
+        tops = self.tops
+        missing = 0
+        for x in xrange(self.width):
+            tops[x] = self.height
+            if self.column_counts[x]:
+                missing |= 1 << (x + Pad)
+        for y in xrange(self.height):
+            if not missing:
+                break
+            found = self.rows[y] & missing
+            if found:
+                missing ^= found
+                for x in xrange(self.width):
+                    if found & (1 << (x + Pad)):
+                        tops[x] = y
+
+    # Check if the cell at [x,y] is filled.
+    def filled(self, x, y):
+        return bool(self.rows[y] & (1 << (x + Pad)))
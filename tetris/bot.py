@@ -0,0 +1,162 @@
+import time
+from tetris.policy import Policy
+from tetris.engine import ShiftLeft, ShiftRight, HardDrop, RotateLeft, RotateRight
+
+# Weights of the board features in a placement's value
+HeightWeight = -0.51
+LinesWeight = 0.76
+HolesWeight = -0.36
+BumpinessWeight = -0.18
+
+# Rotations reachable from spawn, with the rotations passed through on the
+# way, one turn per step
+RotationPaths = ((0, ()), (1, (1,)), (3, (3,)), (2, (1, 2)))
+
+# Every final placement of a shape reachable by turning it at its spawn
+# position, shifted by offset columns, sliding it sideways and dropping it.
+# Yields (rotation, x, y, state).
+def placements(board, shape, offset=0):
+
+    x, y = shape.spawn.x + offset, shape.spawn.y
+    seen = set()
+    for rotation, path in RotationPaths:
+
+        state = shape.rotations[rotation]
+        if state.masks in seen:
+            continue
+        seen.add(state.masks)
+        if board.collides(state, x, y):
+            continue
+        if any(board.collides(shape.rotations[r], x, y) for r in path):
+            continue
+
+        left = x
+        while not board.collides(state, left - 1, y):
+            left -= 1
+        right = x
+        while not board.collides(state, right + 1, y):
+            right += 1
+
+        for column in xrange(left, right + 1):
+            yield rotation, column, y + board.drop_distance(state, column, y), state
+
+# Plays by searching every placement of the current piece, and of the next
+# piece for the most promising few, then steering the piece to the best
+# one with the same actions as the keyboard. Board values are memoized by
+# the board's rows, in a bounded cache that drops an arbitrary entry for
+# each new one once full, so no single decision pays to empty it.
+class Bot(Policy):
+
+    def __init__(self, lookahead=True, candidates=4, capacity=1 << 16):
+        self.lookahead = lookahead
+        self.candidates = candidates
+        self.capacity = capacity
+        self.cache = {}
+        self.hits = 0
+        self.misses = 0
+        self.decisions = 0
+        self.thinking = 0.0
+        self.target = None
+        self.pieces = None
+        self.last = None
+
+    # Start a game, keeping the cache but counting decisions afresh
+    def reset(self, engine, seed):
+        self.target = None
+        self.pieces = None
+        self.last = None
+        self.hits = self.misses = 0
+        self.decisions = 0
+        self.thinking = 0.0
+
+    # Choose this step's actions, planning a placement for each new piece.
+    def act(self, engine):
+
+        piece = engine.curr_piece
+        if engine.stats.pieces != self.pieces:
+            self.pieces = engine.stats.pieces
+            start = time.time()
+            self.target = self.decide(engine)
+            self.thinking += time.time() - start
+            self.decisions += 1
+            self.last = None
+
+        # Drop where the piece is if the last step made no progress
+        position = (piece.rotation, piece.x)
+        if position == self.last:
+            return HardDrop
+        self.last = position
+
+        rotation, x = self.target
+        if piece.rotation != rotation:
+            return RotateLeft if (rotation - piece.rotation) & 3 == 3 else RotateRight
+        if piece.x < x:
+            return ShiftRight
+        if piece.x > x:
+            return ShiftLeft
+        return HardDrop
+
+    # Best (rotation, x) for the current piece.
+    def decide(self, engine):
+
+        piece = engine.curr_piece
+        scored = []
+        for rotation, x, y, state in placements(engine.board, piece.shape, engine.spawn_offset):
+            if y + state.origin.x <= 0:
+                continue
+            board = engine.board.copy()
+            value = self.evaluate(board, board.lock(state, x, y))
+            scored.append((value, rotation, x, board))
+
+        if not scored:
+            return piece.rotation, piece.x
+
+        if self.lookahead:
+            scored.sort(key=lambda s: s[0], reverse=True)
+            shape, offset = engine.next_piece.shape, engine.spawn_offset
+            scored = [(value + self.best_value(board, shape, offset), rotation, x, board)
+                      for value, rotation, x, board in scored[:self.candidates]]
+
+        value, rotation, x, board = max(scored, key=lambda s: s[0])
+        return rotation, x
+
+    # Best value reachable by placing a shape on a board.
+    def best_value(self, board, shape, offset=0):
+        best = None
+        for rotation, x, y, state in placements(board, shape, offset):
+            if y + state.origin.x <= 0:
+                continue
+            child = board.copy()
+            value = self.evaluate(child, child.lock(state, x, y))
+            if best is None or value > best:
+                best = value
+        return best if best is not None else -1e9
+
+    # Value of a board just after a placement cleared the given rows.
+    def evaluate(self, board, cleared):
+
+        key = tuple(board.rows)
+        value = self.cache.get(key)
+        if value is None:
+            self.misses += 1
+            heights = board.heights()
+            bumpiness = 0
+            for x in xrange(1, len(heights)):
+                bumpiness += abs(heights[x] - heights[x - 1])
+            value = (HeightWeight * sum(heights) + HolesWeight * board.holes() +
+                     BumpinessWeight * bumpiness)
+            if len(self.cache) >= self.capacity:
+                self.cache.popitem()
+            self.cache[key] = value
+        else:
+            self.hits += 1
+        return value + LinesWeight * len(cleared)
+
+    # Decision throughput and cache use this game.
+    def report(self):
+        lookups = self.hits + self.misses
+        return {
+            'decisions': self.decisions,
+            'decision_rate': self.decisions / self.thinking if self.thinking else 0.0,
+            'cache_hit_rate': self.hits / float(lookups) if lookups else 0.0
+        }
@@ -0,0 +1,102 @@
+import os
+import mmap
+import struct
+import pygame
+
+# Directories of the loose asset files, and the default bundle path
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ImagePath = os.path.join(Root, 'images')
+SoundPath = os.path.join(Root, 'sounds')
+BundlePath = os.path.join(Root, 'assets.bundle')
+
+# Bundle files start with a header holding the mixer format the sounds were
+# decoded for, then an index entry per asset. Asset data follows the index,
+# each entry aligned so buffers over it start on a word boundary. Images are
+# raw pixels in the entry's format, sounds raw samples.
+Magic = 'TBND'
+Version = 1
+Header = struct.Struct('<4sBIiii')
+Entry = struct.Struct('<32s8sQIHH')
+Align = 16
+
+# Images and sounds packed by build
+Images = ('splash.png', 'tetris-background.png', 'blocks.png')
+Sounds = ('clear.wav', 'drop.wav', 'lateralmove.wav', 'levelup.wav', 'rotate.wav',
+          'select.wav', 'start.wav', 'tetris.wav', 'gameover.wav')
+
+# Pre-decoded assets in one memory-mapped file. Surfaces and sounds are
+# built straight from buffers over the map, with no file reads or decoding.
+class Bundle(object):
+
+    def __init__(self, path):
+
+        with open(path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, count, frequency, size, channels = Header.unpack_from(self.map)
+        if magic != Magic or version != Version:
+            raise ValueError("%s is not a version %d asset bundle" % (path, Version))
+        self.mixer = (frequency, size, channels)
+
+        self.entries = {}
+        for i in xrange(count):
+            name, kind, offset, length, width, height = Entry.unpack_from(self.map, Header.size + i * Entry.size)
+            self.entries[name.rstrip('\0')] = (kind.rstrip('\0'), offset, length, width, height)
+
+    def __contains__(self, name):
+        return name in self.entries
+
+    def data(self, name):
+        kind, offset, length, width, height = self.entries[name]
+        return buffer(self.map, offset, length)
+
+    # Surface over an image's pixels. It shares the map's memory, so
+    # convert it before drawing with it.
+    def image(self, name):
+        kind, offset, length, width, height = self.entries[name]
+        return pygame.image.frombuffer(self.data(name), (width, height), kind)
+
+    # Sound from raw samples, or None if the mixer's format differs from
+    # the one the bundle was built for.
+    def sound(self, name):
+        if pygame.mixer.get_init() != self.mixer:
+            return None
+        return pygame.mixer.Sound(buffer=self.data(name))
+
+# The bundle at BundlePath, opened on first use, or None if there isn't one
+bundles = {}
+
+def default():
+    if BundlePath not in bundles:
+        bundles[BundlePath] = Bundle(BundlePath) if os.path.exists(BundlePath) else None
+    return bundles[BundlePath]
+
+# Decode the loose asset files and pack them into a bundle at path. The
+# mixer must be initialised with the format the game plays in.
+def build(path=BundlePath):
+
+    assets = []
+    for filename in Images:
+        surface = pygame.image.load(os.path.join(ImagePath, filename))
+        kind = 'RGBA' if surface.get_flags() & pygame.SRCALPHA else 'RGB'
+        width, height = surface.get_size()
+        assets.append((filename, kind, pygame.image.tostring(surface, kind), width, height))
+    for filename in Sounds:
+        sound = pygame.mixer.Sound(os.path.join(SoundPath, filename))
+        assets.append((filename, 'PCM', sound.get_raw(), 0, 0))
+
+    frequency, size, channels = pygame.mixer.get_init()
+    offset = Header.size + len(assets) * Entry.size
+    index, blobs = [], []
+    for name, kind, data, width, height in assets:
+        padding = -offset % Align
+        offset += padding
+        index.append(Entry.pack(name, kind, offset, len(data), width, height))
+        blobs.append('\0' * padding + data)
+        offset += len(data)
+
+    with open(path + '.tmp', 'wb') as f:
+        f.write(Header.pack(Magic, Version, len(assets), frequency, size, channels))
+        f.write(''.join(index))
+        f.write(''.join(blobs))
+    os.rename(path + '.tmp', path)
+    return path
@@ -0,0 +1,82 @@
+import json
+import time
+import random
+import socket
+import select
+from tetris.engine import TickRate
+from tetris.policy import RandomPolicy
+
+# Connect to a server address, a (host, port) pair or a Unix socket path
+def connect(address):
+    if isinstance(address, tuple):
+        sock = socket.create_connection(address)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    else:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(address)
+    return sock
+
+# A test client playing random keys over one connection and counting the
+# states it receives.
+class Client(object):
+
+    def __init__(self, address, seed):
+        self.sock = connect(address)
+        self.random = random.Random(seed)
+        self.actions = RandomPolicy.Actions
+        self.inbuf = ''
+        self.states = 0
+        self.boards = 0
+        self.last = None
+        self.sock.sendall('r %d\n' % seed)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def press(self):
+        actions = self.random.choice(self.actions)
+        if actions:
+            self.sock.sendall('a %d\n' % actions)
+
+    def read(self):
+        data = self.sock.recv(65536)
+        if not data:
+            return False
+        lines = (self.inbuf + data).split('\n')
+        self.inbuf = lines.pop()
+        for line in lines:
+            state = json.loads(line)
+            self.states += 1
+            self.boards += 'board' in state
+            self.last = state
+            if not state['running']:
+                self.sock.sendall('r\n')
+        return True
+
+    def close(self):
+        self.sock.sendall('q\n')
+        self.sock.close()
+
+# Run count clients against a server for a number of seconds, pressing
+# keys about once a tick. Returns the states per second each received on
+# average, and the number of states received in all.
+def run_clients(address, count, seconds, seed=0):
+
+    clients = [Client(address, seed + i) for i in xrange(count)]
+    start = time.time()
+    next_press = start
+    while time.time() - start < seconds:
+        now = time.time()
+        if now >= next_press:
+            for client in clients:
+                client.press()
+            next_press += 1.0 / TickRate
+        readable, writable, failed = select.select(clients, [], [], max(0.0, next_press - time.time()))
+        for client in readable:
+            client.read()
+    elapsed = time.time() - start
+
+    total = sum(client.states for client in clients)
+    for client in clients:
+        client.close()
+    return total / elapsed / count, total
@@ -0,0 +1,406 @@
+import struct
+from bisect import bisect_right
+from tetris.util import Dimension
+from tetris.engine import Observer, GridSize
+from tetris.piece import Shapes
+
+# A game is encoded as a stream of records, each starting with a tag byte:
+#   Keyframe  the whole state: tick, grid size, grid cells at two bits each,
+#             stats, current piece and next shape
+#   Idle      a count of ticks in which nothing changed
+#   otherwise one tick's delta, the tag holding which parts follow and the
+#             piece rotation: each lock (its rotation and offset, the cleared
+#             rows and the shape drawn next), the piece's move, the stat changes
+# Numbers are varints, signed ones zigzag encoded. Moves and lock positions
+# are offsets from where the piece was. A move of under 8 columns and 16 rows
+# packs into one byte, so a tick of gravity or shifting takes two.
+Keyframe = 0xff
+Idle = 0xfe
+Moved, Locked, Scored, Ended = 0x01, 0x02, 0x04, 0x08
+RotationShift = 4
+Far = 0x40
+
+# Ticks between keyframes, about ten seconds of play
+KeyInterval = 600
+
+# Archive files start with a header holding the number of keyframes, then
+# one (tick, offset) index entry per keyframe, then the records.
+Magic = 'TDLT'
+Version = 1
+Header = struct.Struct('<4sBI')
+IndexEntry = struct.Struct('<II')
+
+def write_varint(out, n):
+    while n > 0x7f:
+        out.append(n & 0x7f | 0x80)
+        n >>= 7
+    out.append(n)
+
+def write_signed(out, n):
+    write_varint(out, n << 1 if n >= 0 else (-n << 1) - 1)
+
+def read_varint(data, pos):
+    n = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        n |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return n, pos
+        shift += 7
+
+def read_signed(data, pos):
+    n, pos = read_varint(data, pos)
+    return (n >> 1) ^ -(n & 1), pos
+
+# Encodes the games played on an engine, one record per tick. Attach it to
+# the engine and call tick after each step; locks are seen as they happen.
+# A keyframe starts every game and follows every interval ticks, and the
+# index keeps each one's (tick, offset) for seeking.
+class Encoder(Observer):
+
+    def __init__(self, interval=KeyInterval):
+        self.interval = interval
+        self.data = bytearray()
+        self.index = []
+        self.base = 0
+        self.ticks = 0
+        self.idle = 0
+        self.locks = []
+        self.width = 0
+        self.counts = []
+        self.rotation = self.x = self.y = 0
+        self.score = self.lines = self.level = 0
+        self.running = False
+
+    def on_start(self, engine):
+        self.ticks = 0
+        self.locks = []
+        self.idle = 0
+        self.keyframe(engine)
+
+    # Note a lock's rotation and offset and the rows it cleared. The engine
+    # has already dropped the rows, so the filled cells of each row are
+    # counted here to find them.
+    def on_lock(self, engine, cleared):
+        piece = engine.curr_piece
+        if self.locks:
+            self.locks[-1][-1] = Shapes.index(engine.next_piece.shape)
+        counts, y = self.counts, piece.y
+        rows = []
+        for dx, dy, value in piece.state.cells:
+            if y + dy >= 0:
+                counts[y + dy] += 1
+                if counts[y + dy] == self.width:
+                    rows.append(y + dy)
+        if rows:
+            rows.sort()
+            for row in rows:
+                del counts[row]
+                counts.insert(0, 0)
+        self.locks.append([piece.rotation, piece.x - self.x, piece.y - self.y, rows, None])
+        after = engine.next_piece
+        self.rotation, self.x, self.y = 0, after.x, after.y
+
+    # Write the full state and start the deltas over from it
+    def keyframe(self, engine):
+
+        self.flush_idle()
+        data = self.data
+        self.index.append((self.ticks, self.base + len(data)))
+        data.append(Keyframe)
+        write_varint(data, self.ticks)
+        write_varint(data, engine.size.width)
+        write_varint(data, engine.size.height)
+
+        cells = [value for column in engine.grid for value in column] + [0] * 3
+        data.extend(cells[i] | cells[i + 1] << 2 | cells[i + 2] << 4 | cells[i + 3] << 6
+                    for i in xrange(0, len(cells) - 3, 4))
+
+        stats, piece = engine.stats, engine.curr_piece
+        for n in (stats.score, stats.lines, stats.level, stats.pieces):
+            write_varint(data, n)
+        data.append(Shapes.index(piece.shape))
+        data.append(piece.rotation)
+        write_signed(data, piece.x)
+        write_signed(data, piece.y)
+        data.append(Shapes.index(engine.next_piece.shape))
+        data.append(engine.running)
+
+        self.width = engine.size.width
+        self.counts = engine.board.counts[:]
+        self.rotation, self.x, self.y = piece.rotation, piece.x, piece.y
+        self.score, self.lines, self.level = stats.score, stats.lines, stats.level
+        self.running = engine.running
+
+    # Encode the tick just stepped
+    def tick(self, engine):
+
+        self.ticks += 1
+        if self.ticks % self.interval == 0:
+            self.locks = []
+            self.keyframe(engine)
+            return
+
+        piece, stats, locks = engine.curr_piece, engine.stats, self.locks
+        rotation = piece.rotation
+        dx, dy = piece.x - self.x, piece.y - self.y
+        tag = rotation << RotationShift
+        if dx or dy or rotation != self.rotation:
+            tag |= Moved if -8 <= dx < 8 and 0 <= dy < 16 else Moved | Far
+        if locks:
+            tag |= Locked
+            locks[-1][-1] = Shapes.index(engine.next_piece.shape)
+        if stats.score != self.score:
+            tag |= Scored
+        if self.running and not engine.running:
+            tag |= Ended
+
+        if not tag & (Locked | Moved | Scored | Ended):
+            self.idle += 1
+            return
+
+        data = self.data
+        if self.idle:
+            self.flush_idle()
+        data.append(tag)
+        if tag & Locked:
+            write_varint(data, len(locks))
+            for lock_rotation, lock_x, lock_y, rows, shape in locks:
+                data.append(lock_rotation)
+                write_signed(data, lock_x)
+                write_signed(data, lock_y)
+                write_varint(data, len(rows))
+                for row in rows:
+                    write_varint(data, row)
+                data.append(shape)
+            self.locks = []
+        if tag & Far:
+            write_signed(data, dx)
+            write_signed(data, dy)
+        elif tag & Moved:
+            data.append(dx + 8 | dy << 4)
+        if tag & Scored:
+            write_varint(data, stats.score - self.score)
+            write_varint(data, stats.lines - self.lines)
+            write_varint(data, stats.level - self.level)
+            self.score, self.lines, self.level = stats.score, stats.lines, stats.level
+        self.rotation, self.x, self.y = rotation, piece.x, piece.y
+        self.running = engine.running
+
+    def flush_idle(self):
+        if self.idle:
+            self.data.append(Idle)
+            write_varint(self.data, self.idle)
+            self.idle = 0
+
+    # The records written so far, removed from the encoder. A run of idle
+    # ticks is held back until it ends. Index offsets stay counted from the
+    # start of the stream.
+    def take(self):
+        data = str(self.data)
+        self.base += len(self.data)
+        self.data = bytearray()
+        return data
+
+    # The whole stream with any trailing idle ticks
+    def finish(self):
+        self.flush_idle()
+        return str(self.data)
+
+    # Write the stream and its index to an archive. The stream must be whole,
+    # so an encoder whose records were taken can't be saved.
+    def save(self, path):
+        if self.base:
+            raise ValueError("records were taken from this encoder, so the archive would be partial")
+        data = self.finish()
+        with open(path, 'wb') as f:
+            f.write(Header.pack(Magic, Version, len(self.index)))
+            f.write(''.join(IndexEntry.pack(tick, offset) for tick, offset in self.index))
+            f.write(data)
+
+# Load an archive's records and keyframe index
+def load(path):
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, count = Header.unpack_from(data)
+    if magic != Magic or version != Version:
+        raise ValueError("%s is not a version %d archive" % (path, Version))
+    start = Header.size + count * IndexEntry.size
+    index = [IndexEntry.unpack_from(data, Header.size + i * IndexEntry.size) for i in xrange(count)]
+    return data[start:], index
+
+# Rebuilds game states from a stream, one tick at a time. The grid is kept
+# as a list of rows, so cleared rows are deleted rather than copied down,
+# and the piece as (shape index, rotation, x, y). Records are read whole
+# before any state changes, so a stream can be fed in as it arrives.
+class Decoder(object):
+
+    def __init__(self, data='', index=None):
+        self.data = bytearray(data)
+        self.index = index
+        self.pos = 0
+        self.pending = 0
+        self.tick = 0
+        self.size = GridSize
+        self.grid = []
+        self.score = self.lines = self.level = self.pieces = 0
+        self.piece = None
+        self.next = None
+        self.running = False
+        self.step()
+
+    # Add bytes received from a stream
+    def feed(self, data):
+        self.data.extend(data)
+
+    # Advance one tick. Returns False when the stream ends, or stops partway
+    # through a record.
+    def step(self):
+
+        if self.pending:
+            self.pending -= 1
+            self.tick += 1
+            return True
+
+        data, pos = self.data, self.pos
+        if pos >= len(data):
+            return False
+        try:
+            tag = data[pos]
+            if tag == Keyframe:
+                self.pos = self.read_keyframe(pos + 1)
+                return True
+            if tag == Idle:
+                ticks, self.pos = read_varint(data, pos + 1)
+                self.pending = ticks - 1
+                self.tick += 1
+                return True
+            if tag & (Locked | Scored | Ended | Far):
+                pos = self.read_delta(tag, pos + 1)
+            else:
+                move = data[pos + 1]
+                shape, rotation, x, y = self.piece
+                self.piece = (shape, tag >> RotationShift & 3, x + (move & 15) - 8, y + (move >> 4))
+                pos += 2
+        except IndexError:
+            return False
+        self.pos = pos
+        self.tick += 1
+        return True
+
+    # Read a delta record and apply it. Returns the position after it.
+    def read_delta(self, tag, pos):
+
+        data = self.data
+        locks = []
+        if tag & Locked:
+            count, pos = read_varint(data, pos)
+            for i in xrange(count):
+                rotation = data[pos]
+                dx, pos = read_signed(data, pos + 1)
+                dy, pos = read_signed(data, pos)
+                n, pos = read_varint(data, pos)
+                rows = []
+                for j in xrange(n):
+                    row, pos = read_varint(data, pos)
+                    rows.append(row)
+                locks.append((rotation, dx, dy, rows, data[pos]))
+                pos += 1
+        if tag & Far:
+            dx, pos = read_signed(data, pos)
+            dy, pos = read_signed(data, pos)
+        elif tag & Moved:
+            move = data[pos]
+            pos += 1
+            dx, dy = (move & 15) - 8, move >> 4
+        else:
+            dx = dy = 0
+        if tag & Scored:
+            score, pos = read_varint(data, pos)
+            lines, pos = read_varint(data, pos)
+            level, pos = read_varint(data, pos)
+            self.score += score
+            self.lines += lines
+            self.level += level
+
+        shape, rotation, x, y = self.piece
+        for rotation, lock_x, lock_y, rows, drawn in locks:
+            self.lock(shape, rotation, x + lock_x, y + lock_y, rows)
+            shape, self.next = self.next, drawn
+            spawn = Shapes[shape].spawn
+            x, y = spawn.x + (self.size.width - GridSize.width) / 2, spawn.y
+            self.pieces += 1
+        if tag & Ended:
+            self.running = False
+        self.piece = (shape, tag >> RotationShift & 3, x + dx, y + dy)
+        return pos
+
+    # Read a keyframe and take on its state. Returns the position after it.
+    def read_keyframe(self, pos):
+
+        data = self.data
+        tick, pos = read_varint(data, pos)
+        width, pos = read_varint(data, pos)
+        height, pos = read_varint(data, pos)
+
+        count = width * height
+        end = pos + (count + 3) / 4
+        cells = []
+        for byte in data[pos:end]:
+            cells.extend((byte & 3, byte >> 2 & 3, byte >> 4 & 3, byte >> 6))
+        if len(cells) < count:
+            raise IndexError
+        pos = end
+
+        score, pos = read_varint(data, pos)
+        lines, pos = read_varint(data, pos)
+        level, pos = read_varint(data, pos)
+        pieces, pos = read_varint(data, pos)
+        shape, rotation = data[pos], data[pos + 1]
+        x, pos = read_signed(data, pos + 2)
+        y, pos = read_signed(data, pos)
+        running = data[pos + 1]
+
+        self.tick = tick
+        self.size = Dimension(width, height)
+        self.grid = [cells[row:count:height] for row in xrange(height)]
+        self.score, self.lines, self.level, self.pieces = score, lines, level, pieces
+        self.piece = (shape, rotation, x, y)
+        self.next = data[pos]
+        self.running = bool(running)
+        self.pending = 0
+        return pos + 2
+
+    # Set a locked piece's cells into the grid and drop the cleared rows
+    def lock(self, shape, rotation, x, y, rows):
+        grid = self.grid
+        for cx, cy, value in Shapes[shape].rotations[rotation].cells:
+            if y + cy >= 0:
+                grid[y + cy][x + cx] = value
+        for row in rows:
+            del grid[row]
+            grid.insert(0, [0] * self.size.width)
+
+    # Check the decoded state is the engine's, as a round trip check of the
+    # encoder that played it
+    def matches(self, engine):
+        piece, stats = engine.curr_piece, engine.stats
+        return (self.grid == [list(row) for row in zip(*engine.grid)] and
+                self.piece == (Shapes.index(piece.shape), piece.rotation, piece.x, piece.y) and
+                self.next == Shapes.index(engine.next_piece.shape) and
+                (self.score, self.lines, self.level, self.pieces) ==
+                (stats.score, stats.lines, stats.level, stats.pieces) and
+                self.running == engine.running)
+
+    # Jump to a tick, from the last keyframe at or before it when indexed
+    def seek(self, tick):
+        if self.index:
+            i = bisect_right([t for t, offset in self.index], tick) - 1
+            if i >= 0 and (tick < self.tick or self.index[i][0] > self.tick):
+                self.pos = self.index[i][1]
+                self.pending = 0
+                self.step()
+        while self.tick < tick and self.step():
+            pass
+        return self.tick == tick
@@ -0,0 +1,126 @@
+import time
+import pygame
+from pygame.locals import *
+from tetris.engine import TickRate, ShiftLeft, ShiftRight, HardDrop, RotateRight
+
+# Game actions of each key
+Bindings = {
+    K_LEFT: ShiftLeft,
+    K_RIGHT: ShiftRight,
+    K_DOWN: HardDrop,
+    K_UP: RotateRight
+}
+
+# Actions that repeat while their key is held
+Repeating = ShiftLeft | ShiftRight
+
+# Default seconds a shift key is held before it repeats (delayed auto
+# shift), and seconds between repeats after that (auto repeat rate)
+AutoShiftDelay = 0.167
+AutoRepeatRate = 0.033
+
+# Event types the game handles. Everything else is kept off the queue.
+Events = (QUIT, KEYDOWN, KEYUP)
+
+# Samples of the time from a key press to the logic tick that acted on it
+class Latency(object):
+
+    Capacity = 1000
+
+    def __init__(self):
+        self.samples = []
+        self.count = 0
+
+    def add(self, seconds):
+        if len(self.samples) >= self.Capacity:
+            self.samples.pop(0)
+        self.samples.append(seconds)
+        self.count += 1
+
+    def report(self):
+        if not self.samples:
+            return 'input latency: no presses'
+        samples = sorted(self.samples)
+        n = len(samples)
+        return 'input latency over %d presses: mean %.1f ms, p50 %.1f ms, p99 %.1f ms, max %.1f ms' % (
+            n, sum(samples) / n * 1000, samples[n / 2] * 1000,
+            samples[min(n - 1, n * 99 / 100)] * 1000, samples[-1] * 1000)
+
+# Keyboard state kept from key events: keys held with the time they went
+# down, and the presses since the last logic tick, so a press is seen even
+# if the key is released before the tick. Each tick turns it into engine
+# action flags, repeating held shifts after the auto shift delay at the
+# auto repeat rate whatever the OS key repeat is set to. Of the two shift
+# keys, the last one pressed wins.
+class Controls(object):
+
+    def __init__(self, das=AutoShiftDelay, arr=AutoRepeatRate):
+        self.das = max(1, int(round(das * TickRate)))
+        self.arr = max(1, int(round(arr * TickRate)))
+        self.held = {}
+        self.presses = []
+        self.shift = None
+        self.shift_ticks = 0
+        self.latency = Latency()
+
+    # Keep unused events off the queue and turn off OS key repeat
+    def setup(self):
+        pygame.event.set_blocked(None)
+        pygame.event.set_allowed(list(Events))
+        pygame.key.set_repeat()
+
+    def handle_event(self, event):
+        if event.type == KEYDOWN:
+            if event.key not in self.held:
+                now = time.time()
+                self.held[event.key] = now
+                self.presses.append((event.key, now))
+                if Bindings.get(event.key, 0) & Repeating:
+                    self.shift = event.key
+                    self.shift_ticks = 0
+        elif event.type == KEYUP:
+            self.held.pop(event.key, None)
+            if event.key == self.shift:
+                self.shift = None
+                for key in self.held:
+                    if Bindings.get(key, 0) & Repeating:
+                        self.shift = key
+                        self.shift_ticks = 0
+
+    # Check if a key is held down
+    def down(self, key):
+        return key in self.held
+
+    # Check if a key went down since the last tick
+    def pressed(self, key):
+        return any(k == key for k, t in self.presses)
+
+    # Action flags for this tick: every key pressed since the last one, and
+    # the held shift if it is due to repeat
+    def actions(self):
+
+        actions = shift = 0
+        for key, t in self.presses:
+            action = Bindings.get(key, 0)
+            if action & Repeating:
+                shift = action
+            else:
+                actions |= action
+        actions |= shift
+
+        if self.shift is not None:
+            ticks = self.shift_ticks
+            if ticks >= self.das and (ticks - self.das) % self.arr == 0:
+                actions |= Bindings[self.shift]
+            self.shift_ticks += 1
+        return actions
+
+    # Note the presses since the last tick as acted on, and start counting
+    # towards the next tick
+    def end_tick(self, acted=True):
+        if acted:
+            now = time.time()
+            for key, t in self.presses:
+                if key in Bindings:
+                    self.latency.add(now - t)
+        self.presses = []
@@ -1,97 +1,261 @@
 import sys
 import pygame
 from pygame.locals import *
+from tetris import text
 from tetris.game import Tetris
+from tetris.engine import TickRate, GridSize
 from tetris.image import Gallery
+from tetris.assets import Loader
+from tetris.controls import Controls
+from tetris.replay import Recorder
+from tetris.rewind import Rewind
+from tetris import frames
+from tetris.frames import FrameProfiler
 from tetris.util import ScreenSize
 
+# Seconds the game over screen shows before returning to the menu
+GameOverTime = 6.7
+
+# Most seconds of logic to catch up on after a stall, so a long hitch
+# can't leave the loop forever behind
+MaxLag = 0.25
+
 class Core(object):
 
     Menu, Running, Paused, GameOver = xrange(4)
 
-    def __init__(self, gfx):
+    # Logic runs at a fixed TickRate whatever the frame rate; fps caps
+    # rendering, with 0 leaving it uncapped. A policy, if given, plays in
+    # place of the keyboard. Games start from seed if given, and with a
+    # record path each game's replay is saved there when it ends. Assets
+    # other than the splash load through the loader while the menu shows.
+    # With latency set, input latency is reported after each game. Frame
+    # timings are always kept; with a profile path, block and stats panel
+    # drawing are sampled too and the timings are saved there on exit.
+    # Games are played on a grid of the given size, under the engine's
+    # gravity and lock delay if given. With rewind set to a
+    # number of seconds, holding backspace plays the game back that far.
+    # Telemetry, if given, records every game and is closed on exit.
+    def __init__(self, gfx, dirty=True, fps=60, policy=None, seed=None, record=None, loader=None,
+                 muted=False, controls=None, latency=False, profile=None,
+                 width=GridSize.width, height=GridSize.height, rewind=0, telemetry=None,
+                 gravity=None, lock_delay=None):
         self.gfx = gfx
-        self.keys = {}
+        self.controls = controls or Controls()
+        self.latency = latency
         self.menu = Menu()
-        self.gallery = Gallery()
-        self.game = Tetris()
+        self.loader = loader or Loader()
+        self.gallery = Gallery(self.loader)
+        self.loader.mark('splash loaded')
+        self.game = Tetris(loader=self.loader, width=width, height=height,
+                           gravity=gravity, lock_delay=lock_delay)
+        self.game.mixer.mute(muted)
+        self.started = False
         self.state = self.Menu
         self.time_to_menu = 0
+        self.policy = policy
+        self.seed = seed
+
+        self.record = record
+        self.recorder = Recorder()
+        if record:
+            self.game.attach(self.recorder)
+
+        self.telemetry = telemetry
+        if telemetry:
+            self.game.attach(telemetry)
+
+        # Snapshots of the last seconds of play, for rewinding. The bot and
+        # replays play on without it.
+        self.rewind = None
+        if rewind and not policy:
+            self.rewind = Rewind(self.game, rewind)
+
+        # Redraw only changed regions, repainting fully on state changes
+        self.dirty = dirty
+        self.drawn_state = None
+        self.fps = fps
+
+        # Frame profiler, and the overlay showing it toggled with F3
+        self.profiler = FrameProfiler()
+        self.profile = profile
+        self.overlay = None
+        if profile:
+            self.profiler.sample(self.gallery, 'render_block', 'blocks')
+            self.profiler.sample(self.gallery, 'render_ghost', 'ghosts')
+            self.profiler.sample(self.game.panel, 'render_dirty', 'panel')
 
     def run(self):
         
         clock = pygame.time.Clock()
+        tick = 1.0 / TickRate
+        lag = 0.0
+        self.controls.setup()
+        
+        profiler = self.profiler
         
         while True:
-            
-            self.keys = {}
+
+            profiler.begin()
+            lag = min(lag + clock.tick(self.fps) / 1000.0, MaxLag)
+            profiler.mark(frames.Wait)
+
             for event in pygame.event.get():
                 self.handle_event(event)
-                
-            self.gfx.fill((0, 0, 0))
+            profiler.mark(frames.Events)
 
-            if self.state == self.Menu:
-                self.menu.render(self.gfx, self.gallery)
+            # Run whole logic ticks for the time passed. Keys pressed since
+            # the last tick apply to the next one, even across frames.
+            while lag >= tick:
+                self.tick()
+                lag -= tick
+            profiler.mark(frames.Logic)
+
+            # Render, leaving the rects to update, or None for all of them
+            rects = []
+            full = not self.dirty or self.state != self.drawn_state
+            if full:
+                self.render_all()
+            elif self.state in (self.Running, self.GameOver):
+                rects = self.game.render_dirty(self.gfx, self.gallery)
+            if self.overlay:
+                rects.append(self.overlay.render(self.gfx, profiler))
+            profiler.mark(frames.Render)
+
+            if full:
+                pygame.display.update()
+                if self.drawn_state is None:
+                    self.loader.mark('menu shown')
+                self.drawn_state = self.state
+            elif rects:
+                pygame.display.update(rects)
+            profiler.mark(frames.Display)
+
+            # Sounds posted by this frame's ticks play after it is drawn
+            self.game.mixer.flush()
+            profiler.mark(frames.Audio)
+            profiler.end()
+
+    # Advance the game and menu state by one logic tick
+    def tick(self):
+
+        if self.rewinding():
+            self.controls.end_tick(False)
+            return
+
+        playing = self.state == self.Running
+        if playing:
+            if self.policy:
+                actions = self.policy.act(self.game)
             else:
-                if self.state == self.Running:
-                    self.game.process_key_events(self.keys)
-                    self.game.update()
-                self.game.render(self.gfx, self.gallery)
-            
-            self.process_key_events()
-            self.update()
-            self.render()
-            
-            pygame.display.update()
-            clock.tick(30)
+                actions = self.controls.actions()
+            self.game.step(actions)
+
+        self.process_key_events()
+        self.controls.end_tick(playing and not self.policy)
+        self.update()
+
+    # Step the game back a tick while backspace is held, picking play back
+    # up if the game had ended. Returns True if it rewound.
+    def rewinding(self):
+
+        if not self.rewind or not self.controls.down(K_BACKSPACE):
+            return False
+        if self.state not in (self.Running, self.GameOver) or not self.rewind.rewind():
+            return False
+        if self.record:
+            self.recorder.rewind(1)
+        if self.state == self.GameOver:
+            self.state = self.Running
+            self.game.mixer.loop_music()
+        return True
+
+    # Repaint the whole screen for the current state
+    def render_all(self):
+
+        self.gfx.fill((0, 0, 0))
+
+        if self.state == self.Menu:
+            self.menu.render(self.gfx, self.gallery)
+        else:
+            self.game.render(self.gfx, self.gallery)
+
+        self.render()
             
     # Handle caught pygame event
     def handle_event(self, event):
 
         # Handle exit events.
         if event.type == QUIT:
+            if self.state in (self.Running, self.Paused):
+                self.save_replay()
+            if self.profile:
+                self.profiler.dump(self.profile)
+            if self.telemetry:
+                self.telemetry.finish(self.game)
+                self.telemetry.close()
             pygame.quit()
             sys.exit()
             
         # Handle key events.
-        elif event.type == KEYDOWN:
-            self.keys[event.key] = True
-        elif event.type == KEYUP:
-            if event.key in self.keys:
-                del self.keys[event.key]
+        else:
+            self.controls.handle_event(event)
             
     def process_key_events(self):
         
-        if K_RETURN in self.keys:
+        if self.controls.pressed(K_RETURN):
             if self.state == self.Menu:
                 self.state = self.Running
-                self.game.new_game()
+                self.gallery.prepare()
+                self.game.new_game(self.seed)
+                if not self.started:
+                    self.loader.mark('first game started')
+                    self.started = True
+                if self.policy:
+                    self.policy.reset(self.game, self.game.seed)
         
-        if K_p in self.keys:
+        if self.controls.pressed(K_p):
             if self.state == self.Running:
                 self.state = self.Paused
                 self.game.mixer.stop_music()
             elif self.state == self.Paused:
                 self.state = self.Running
                 self.game.mixer.loop_music()
+
+        if self.controls.pressed(K_F3):
+            self.overlay = None if self.overlay else PerfOverlay()
+            self.drawn_state = None
+
+        if self.controls.pressed(K_m):
+            mixer = self.game.mixer
+            mixer.mute(not mixer.muted)
+            if self.state == self.Running:
+                mixer.loop_music()
     
     def update(self):
         
         if self.state == self.Running:
             if self.game.game_over():
                 self.game.mixer.stop_music()
+                self.save_replay()
+                if self.latency:
+                    sys.stderr.write(self.controls.latency.report() + '\n')
                 self.state = self.GameOver
-                self.time_to_menu = 200
+                self.time_to_menu = int(GameOverTime * TickRate)
         elif self.state == self.GameOver:
             self.time_to_menu -= 1
             if not self.time_to_menu:
                 self.state = self.Menu
 
+    # Save the current game's replay if recording
+    def save_replay(self):
+        if self.record and self.recorder.replay:
+            self.recorder.finish().save(self.record)
+
     def render(self):
         
         if self.state == self.Paused:
-            font = pygame.font.SysFont("OCR A Extended", 18)
-            label = font.render("PAUSED", 1, (255, 255, 255))
+            label = text.render("PAUSED", 18, (255, 255, 255))
             self.gfx.blit(label, ((ScreenSize[0] / 2) - (label.get_width() / 2), 180))
 
 class Menu(object):
@@ -110,9 +274,50 @@ class Menu(object):
         pygame.draw.aaline(gfx, fg, (10, 10), (10, 279), 1)
         
         # Labels.
-        font = pygame.font.SysFont("OCR A Extended", 20)
-        label = font.render("Play Game", 1, fg)
+        label = text.render("Play Game", 20, fg)
         gfx.blit(label, ((ScreenSize[0] / 2) - (label.get_width() / 2), 300))
-        font = pygame.font.SysFont("OCR A Extended", 12)
-        label = font.render("Jonathan Jengo", 1, fg)
+        label = text.render("Jonathan Jengo", 12, fg)
         gfx.blit(label, ((ScreenSize[0] / 2) - (label.get_width() / 2), 425))
+
+# Frame rate, frame time percentiles and the slowest phase, drawn over the
+# top left corner and refreshed a few times a second.
+class PerfOverlay(object):
+
+    Refresh = 15
+
+    def __init__(self):
+        self.surface = None
+        self.frames = 0
+
+    def render(self, gfx, profiler):
+
+        if self.surface is None or self.frames % self.Refresh == 0:
+            self.update(profiler)
+        self.frames += 1
+        return gfx.blit(self.surface, (0, 0))
+
+    def update(self, profiler):
+
+        stats = profiler.stats()
+        if stats:
+            phase, seconds = stats['slowest']
+            lines = ["%.1f FPS" % stats['fps'],
+                     ' '.join("p%d %.1f" % (p, t * 1000) for p, t in stats['percentiles']) + " ms",
+                     "slowest %s %.2f ms" % (phase, seconds * 1000)]
+        else:
+            lines = ["-- FPS"]
+
+        fg = (255, 255, 0)
+        labels = [text.render(line, 10, fg) for line in lines]
+        # Only ever grow, so a shorter line still covers the last one
+        width = max(label.get_width() for label in labels) + 8
+        height = sum(label.get_height() for label in labels) + 8
+        if self.surface:
+            width = max(width, self.surface.get_width())
+            height = max(height, self.surface.get_height())
+        self.surface = pygame.Surface((width, height)).convert()
+        self.surface.fill((0, 0, 0))
+        y = 4
+        for label in labels:
+            self.surface.blit(label, (4, y))
+            y += label.get_height()
@@ -0,0 +1,454 @@
+import random
+from fractions import Fraction
+from tetris.util import Dimension
+from tetris.board import Board
+from tetris.piece import random_piece, random_shape
+
+# Default size of the grid matrix. Pieces spawn as if the grid were this
+# wide, centred on wider or narrower grids.
+GridSize = Dimension(10, 20)
+
+# Logic ticks per second. Gravity and timers count ticks, so the game plays
+# the same however fast it is rendered.
+TickRate = 60
+
+# Seconds for the piece to fall one row, by level.
+FallDelays = (1.033, 0.933, 0.833, 0.733, 0.633, 0.533, 0.433,
+              0.333, 0.267, 0.2, 0.133, 0.1, 0.067)
+
+# Rows per tick by level for high gravity play: the fall delays above, then
+# levels falling one row a tick and faster, up to 20G where a piece lands
+# the tick it spawns.
+HighGravity = tuple(Fraction(1, max(1, int(round(delay * TickRate)))) for delay in FallDelays) + \
+    (Fraction(1, 3), Fraction(1, 2), Fraction(1), Fraction(2), Fraction(3), Fraction(5), Fraction(20))
+
+# Gravity from the command line: 'high' for the levels above, or rows per
+# tick held at every level, such as 20 or 1/4
+def parse_gravity(text):
+    if text == 'high':
+        return HighGravity
+    rows = Fraction(text)
+    if rows <= 0:
+        raise ValueError("gravity must be above zero")
+    return (rows,)
+
+# Player actions, combined as bit flags for a single step.
+NoAction = 0
+ShiftLeft = 1
+ShiftRight = 2
+SoftDrop = 4
+HardDrop = 8
+RotateLeft = 16
+RotateRight = 32
+
+# Receives game events from an engine. Sound, rendering and logging hook in
+# by overriding the events they care about.
+class Observer(object):
+
+    def on_start(self, engine):
+        pass
+
+    def on_step(self, engine, actions):
+        pass
+
+    def on_shift(self, engine):
+        pass
+
+    def on_rotate(self, engine):
+        pass
+
+    def on_lock(self, engine, cleared):
+        pass
+
+    def on_level_up(self, engine):
+        pass
+
+    def on_game_over(self, engine):
+        pass
+
+# Pure game logic, free of pygame so games can be stepped headless.
+#
+# Gravity is the fall delays by level unless given as rows per tick for
+# each level, the last holding for every level after it. Without a lock
+# delay a landed piece locks when gravity next pulls it; with one it locks
+# that many ticks after landing, the count starting over each time it falls.
+class Engine(object):
+
+    def __init__(self, seed=None, width=GridSize.width, height=GridSize.height,
+                 gravity=None, lock_delay=None):
+        self.size = Dimension(width, height)
+        self.spawn_offset = (width - GridSize.width) / 2
+        self.grid = []
+        self.board = Board(width, height)
+        self.observers = []
+        self.random = random.Random(seed)
+        self.random_state = None
+        self.seed = seed
+        self.stats = Statistics()
+        self.curr_piece = random_piece(self.random)
+        self.next_piece = random_piece(self.random)
+        self.ghost_y = 0
+        self.gravity = tuple(Fraction(str(rows)) for rows in gravity) if gravity else None
+        self.lock_delay = lock_delay
+        self.lock_timer = lock_delay
+        self.update_speed()
+        self.time_to_drop = self.fall_speed
+        self.running = False
+
+        # Steps since the game started, and how many of them had actions
+        self.ticks = 0
+        self.inputs = 0
+
+    def attach(self, observer):
+        self.observers.append(observer)
+
+    def detach(self, observer):
+        self.observers.remove(observer)
+
+    # Start a new game from a seed, drawing one from the piece generator if
+    # none is given. The seed alone decides the pieces, so it and the
+    # actions of each step are enough to replay the game.
+    def reset(self, seed=None):
+        if seed is None:
+            seed = self.random.getrandbits(32)
+        self.seed = seed
+        self.random.seed(seed)
+        self.grid = [[0] * self.size.height for x in xrange(self.size.width)]
+        self.board.clear()
+        self.stats = Statistics()
+        self.spawn(self.next_piece, random_shape(self.random))
+        self.new_piece()
+        self.update_speed()
+        self.time_to_drop = self.fall_speed
+        self.running = True
+        self.ticks = 0
+        self.inputs = 0
+        for observer in self.observers:
+            observer.on_start(self)
+
+    # Apply the action flags and advance one tick. Returns False once the game is over.
+    def step(self, actions=NoAction):
+
+        if not self.running:
+            return False
+
+        for observer in self.observers:
+            observer.on_step(self, actions)
+
+        self.ticks += 1
+        if actions:
+            self.inputs += 1
+        if actions & ShiftLeft:
+            self.shift(-1)
+        if actions & ShiftRight:
+            self.shift(1)
+        if actions & RotateLeft:
+            self.rotate(-1)
+        if actions & RotateRight:
+            self.rotate(1)
+        if actions & SoftDrop:
+            self.soft_drop()
+        if actions & HardDrop:
+            self.hard_drop()
+
+        if self.running:
+            self.update()
+        return self.running
+
+    # Advance one logic tick
+    def update(self):
+
+        # Countdown to current piece drop
+        self.time_to_drop -= self.fall_rows
+        if self.time_to_drop <= 0:
+            if self.lock_delay is None:
+                self.drop_piece(self.rows_due())
+                return
+            self.fall(self.rows_due())
+
+        # Countdown to locking a landed piece
+        if self.lock_delay is not None and self.curr_piece.y == self.ghost_y:
+            self.lock_timer -= 1
+            if self.lock_timer <= 0:
+                self.land()
+
+    # Rows of gravity owed once the drop countdown has run out, restarting it
+    def rows_due(self):
+        rows = -self.time_to_drop / self.fall_speed + 1
+        self.time_to_drop += rows * self.fall_speed
+        return rows
+
+    # Same as that many steps with no action, jumping from drop to drop.
+    # Observers are not told of the steps. A lock delay counts every tick,
+    # so those are stepped one by one.
+    def idle(self, ticks):
+
+        while ticks > 0 and self.running:
+            if self.lock_delay is not None:
+                self.ticks += 1
+                ticks -= 1
+                self.update()
+                continue
+            due = (self.time_to_drop + self.fall_rows - 1) / self.fall_rows
+            if ticks < due:
+                self.time_to_drop -= ticks * self.fall_rows
+                self.ticks += ticks
+                return
+            ticks -= due
+            self.ticks += due
+            self.time_to_drop -= due * self.fall_rows
+            self.drop_piece(self.rows_due())
+
+    # Translate piece by delta
+    def shift(self, dx):
+
+        self.curr_piece.x += dx
+        if not self.valid_move(self.curr_piece):
+            self.curr_piece.x -= dx
+        else:
+            self.update_ghost()
+            for observer in self.observers:
+                observer.on_shift(self)
+
+    # Rotate piece by delta
+    def rotate(self, dr):
+
+        rotated = False
+        if dr < 0:
+            self.curr_piece.rotate_left()
+            if not self.valid_move(self.curr_piece):
+                self.curr_piece.rotate_right()
+            else:
+                rotated = True
+        elif dr > 0:
+            self.curr_piece.rotate_right()
+            if not self.valid_move(self.curr_piece):
+                self.curr_piece.rotate_left()
+            else:
+                rotated = True
+
+        if rotated:
+            self.update_ghost()
+            for observer in self.observers:
+                observer.on_rotate(self)
+
+    # Move piece down one row, locking it if blocked
+    def soft_drop(self):
+        self.drop_piece(1)
+
+    # Drop piece to the bottom and lock it
+    def hard_drop(self):
+        self.drop_piece()
+
+    # Drop piece by up to incr rows, by default to the bottom, locking it if
+    # it lands. The landing row comes straight from the board, so a drop
+    # costs the same however far the piece falls.
+    def drop_piece(self, incr=None):
+
+        piece = self.curr_piece
+        distance = self.board.drop_distance(piece.state, piece.x, piece.y)
+        if incr is not None and incr <= distance:
+            piece.y += incr
+            self.lock_timer = self.lock_delay
+        else:
+            piece.y += distance
+            self.land()
+
+    # Move piece down by up to rows without locking it, for gravity under a
+    # lock delay
+    def fall(self, rows):
+
+        piece = self.curr_piece
+        rows = min(rows, self.board.drop_distance(piece.state, piece.x, piece.y))
+        if rows > 0:
+            piece.y += rows
+            self.lock_timer = self.lock_delay
+
+    # Lock piece where it is, ending the game if it is above the grid
+    def land(self):
+
+        if self.curr_piece.y + self.curr_piece.origin.x <= 0:
+            self.end_game()
+        else:
+            self.place_piece(self.curr_piece)
+
+    # Place piece at grid bottom
+    def place_piece(self, piece):
+
+        # Lock piece into the board and grid, then drop cleared rows.
+        self.set_grid_piece(piece)
+        cleared = self.board.lock(piece.state, piece.x, piece.y)
+        if cleared:
+            self.remove_grid_rows(cleared)
+
+        # Update statistics.
+        for observer in self.observers:
+            observer.on_lock(self, len(cleared))
+        if self.stats.update(len(cleared)):
+            for observer in self.observers:
+                observer.on_level_up(self)
+            self.update_speed()
+
+        self.new_piece()
+
+    # Set gravity for the level, as fall_rows rows every fall_speed ticks.
+    # The drop countdown loses fall_rows each tick and gains fall_speed for
+    # each row dropped, so fractions of a row carry over between ticks.
+    def update_speed(self):
+        level = self.stats.level
+        if self.gravity:
+            rows = self.gravity[min(level, len(self.gravity) - 1)]
+            self.fall_rows, self.fall_speed = rows.numerator, rows.denominator
+        else:
+            delay = FallDelays[min(level, len(FallDelays) - 1)]
+            self.fall_rows, self.fall_speed = 1, max(1, int(round(delay * TickRate)))
+
+    # Remove rows from the grid, shifting the rows above down. Rows below
+    # the lowest removed one stay as they are.
+    def remove_grid_rows(self, rows):
+        removed = set(rows)
+        bottom = max(rows) + 1
+        for column in self.grid:
+            remains = [column[y] for y in xrange(bottom) if y not in removed]
+            column[:bottom] = [0] * len(removed) + remains
+
+    # Set piece values into grid.
+    def set_grid_piece(self, piece):
+        for x, y, value in piece.state.cells:
+            if piece.y + y >= 0:
+                self.grid[piece.x + x][piece.y + y] = value
+
+    # Find the row where the current piece would land.
+    def update_ghost(self):
+        piece = self.curr_piece
+        self.ghost_y = piece.y + self.board.drop_distance(piece.state, piece.x, piece.y)
+
+    # Check if piece can be moved to new location
+    def valid_move(self, piece):
+        return not self.board.collides(piece.state, piece.x, piece.y)
+
+    # Promote the next piece, respawning the old current piece as the next one.
+    def new_piece(self):
+        self.curr_piece, self.next_piece = self.next_piece, self.curr_piece
+        self.spawn(self.next_piece, random_shape(self.random))
+        self.random_state = None
+        self.lock_timer = self.lock_delay
+        if not self.valid_move(self.curr_piece):
+            self.end_game()
+        self.update_ghost()
+
+    # Reset a piece to a shape at its spawn point, centred on the grid
+    def spawn(self, piece, shape):
+        piece.spawn(shape)
+        piece.x += self.spawn_offset
+
+    def end_game(self):
+        self.running = False
+        for observer in self.observers:
+            observer.on_game_over(self)
+
+    def game_over(self):
+        return not self.running
+
+    # Copy the game state into a snapshot, a new one unless given one taken
+    # on this engine. The piece generator's state is only read again once
+    # it has drawn a piece, so snapshots between pieces share it.
+    def snapshot(self, into=None):
+
+        snapshot = into or Snapshot(self.size.width, self.size.height)
+        values = snapshot.values
+        curr, after, stats, board = self.curr_piece, self.next_piece, self.stats, self.board
+        values[:SnapshotFields] = (curr.shape, curr.rotation, curr.x, curr.y,
+                                   after.shape, after.rotation, after.x, after.y,
+                                   stats.score, stats.level, stats.lines, stats.pieces,
+                                   self.fall_rows, self.fall_speed, self.time_to_drop, self.lock_timer,
+                                   self.ghost_y, self.running, self.ticks, self.inputs)
+
+        width, height = self.size.width, self.size.height
+        i = SnapshotFields
+        values[i:i + height] = board.rows
+        values[i + height:i + height * 2] = board.counts
+        i += height * 2
+        values[i:i + width] = board.tops
+        values[i + width:i + width * 2] = board.column_counts
+        i += width * 2
+        for column in self.grid:
+            values[i:i + height] = column
+            i += height
+
+        if self.random_state is None:
+            self.random_state = self.random.getstate()
+        snapshot.random = self.random_state
+        return snapshot
+
+    # Return to the state of a snapshot taken on this engine. Everything is
+    # copied back into the lists and pieces already in place, and the piece
+    # generator is only set when it has drawn since. Observers are not told.
+    def restore(self, snapshot):
+
+        values = snapshot.values
+        curr, after, stats, board = self.curr_piece, self.next_piece, self.stats, self.board
+        (curr.shape, curr.rotation, curr.x, curr.y,
+         after.shape, after.rotation, after.x, after.y,
+         stats.score, stats.level, stats.lines, stats.pieces,
+         self.fall_rows, self.fall_speed, self.time_to_drop, self.lock_timer,
+         self.ghost_y, self.running, self.ticks, self.inputs) = values[:SnapshotFields]
+
+        width, height = self.size.width, self.size.height
+        i = SnapshotFields
+        board.rows[:] = values[i:i + height]
+        board.counts[:] = values[i + height:i + height * 2]
+        i += height * 2
+        board.tops[:] = values[i:i + width]
+        board.column_counts[:] = values[i + width:i + width * 2]
+        i += width * 2
+        for column in self.grid:
+            column[:] = values[i:i + height]
+            i += height
+
+        if snapshot.random is not self.random_state:
+            self.random.setstate(snapshot.random)
+            self.random_state = snapshot.random
+
+# Piece, stats, timer and counter values at the start of a snapshot
+SnapshotFields = 20
+
+# A game state flattened into one list sized for the grid when created:
+# the current and next pieces, stats, timers and step counts, then the
+# board rows and their index, then the grid column by column. Along with it
+# goes the state of the piece generator, so a restored game draws the same
+# pieces.
+class Snapshot(object):
+
+    __slots__ = ('values', 'random')
+
+    def __init__(self, width=GridSize.width, height=GridSize.height):
+        self.values = [0] * (SnapshotFields + (width + 2) * height + width * 2)
+        self.random = None
+
+class Statistics(object):
+
+    Scores = {
+        0: 10,
+        1: 100,
+        2: 300,
+        3: 500,
+        4: 1000
+    }
+
+    def __init__(self):
+        self.score = 0
+        self.level = 0
+        self.lines = 0
+        self.pieces = 0
+
+    # Update stats based on # cleared lines
+    def update(self, cleared):
+        self.pieces += 1
+        self.score += self.Scores[cleared]
+        self.lines += cleared
+        if self.lines / 10 > self.level:
+            self.level += 1
+            return True
+        else:
+            return False
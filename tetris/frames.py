@@ -0,0 +1,87 @@
+import time
+
+# Phases of a frame, in the order Core.run goes through them. Wait is the
+# time the clock sleeps to cap the frame rate.
+Phases = ('wait', 'events', 'logic', 'render', 'display', 'audio')
+Wait, Events, Logic, Render, Display, Audio = xrange(len(Phases))
+
+# Frames kept, about ten seconds at 60 fps
+Capacity = 600
+
+# Splits each frame's time into phases and keeps the last frames in a ring
+# buffer. Sampled methods add their time to the frame they ran in.
+class FrameProfiler(object):
+
+    def __init__(self, capacity=Capacity):
+        self.capacity = capacity
+        self.frames = [None] * capacity
+        self.count = 0
+        self.samples = []
+        self.current = None
+        self.start = self.last = None
+
+    # Time every call of an object's method as a sample, under name
+    def sample(self, obj, method, name):
+
+        index = len(self.samples)
+        self.samples.append(name)
+        call = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.time()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                if self.current:
+                    self.current[len(Phases) + index] += time.time() - start
+        setattr(obj, method, timed)
+
+    def begin(self):
+        self.start = self.last = time.time()
+        self.current = [0.0] * (len(Phases) + len(self.samples))
+
+    # Charge the time since the last mark to a phase
+    def mark(self, phase):
+        now = time.time()
+        self.current[phase] += now - self.last
+        self.last = now
+
+    def end(self):
+        self.frames[self.count % self.capacity] = (self.start, self.last - self.start, self.current)
+        self.count += 1
+        self.current = None
+
+    # Kept frames, oldest first, as (start, seconds, phase and sample seconds)
+    def recent(self):
+        if self.count <= self.capacity:
+            return self.frames[:self.count]
+        i = self.count % self.capacity
+        return self.frames[i:] + self.frames[:i]
+
+    # Frames per second, frame time percentiles in seconds, and the phase
+    # other than wait taking the most time on average, over the kept frames
+    def stats(self, percentiles=(50, 95, 99)):
+        frames = self.recent()
+        if not frames:
+            return None
+        n = len(frames)
+        times = sorted(seconds for start, seconds, split in frames)
+        total = sum(times)
+        fps = n / total if total else 0.0
+        spent = [sum(split[p] for start, seconds, split in frames) for p in xrange(len(Phases))]
+        slowest = max(xrange(1, len(Phases)), key=lambda p: spent[p])
+        return {
+            'fps': fps,
+            'percentiles': [(p, times[min(n - 1, n * p / 100)]) for p in percentiles],
+            'slowest': (Phases[slowest], spent[slowest] / n)
+        }
+
+    # Write the kept frames to a CSV file, times in milliseconds
+    def dump(self, path):
+        with open(path, 'w') as f:
+            f.write(','.join(('start', 'frame') + Phases + tuple(self.samples)) + '\n')
+            for start, seconds, split in self.recent():
+                values = ['%.6f' % start, '%.3f' % (seconds * 1000)]
+                values += ['%.3f' % (s * 1000) for s in split]
+                values += ['0.000'] * (len(Phases) + len(self.samples) - len(split))
+                f.write(','.join(values) + '\n')
@@ -1,272 +1,218 @@
-import sys
-import pygame
-from pygame.locals import *
-from tetris.image import Gallery
-from tetris.util import Point, Dimension
+from tetris import text
+from tetris.util import Point
 from tetris.sound import Mixer
-from tetris.piece import random_piece
+from tetris.image import Layout
+from tetris.engine import Engine, Observer, GridSize
 
-# Size of the grid matrix.
-GridSize = Dimension(10, 20)
+# Engine with pygame sound and rendering attached.
+class Tetris(Engine):
 
-class Tetris(object):
+    def __init__(self, seed=None, loader=None, width=GridSize.width, height=GridSize.height,
+                 gravity=None, lock_delay=None):
+        Engine.__init__(self, seed, width, height, gravity, lock_delay)
+        self.layout = Layout(width, height)
+        self.mixer = Mixer(loader)
+        self.panel = StatsPanel()
+        self.stack = StackView()
+        self.attach(self.mixer)
+        self.attach(self.stack)
 
-    def __init__(self):
-        self.grid = []
-        self.mixer = Mixer()
-        self.stats = Statistics()
-        self.curr_piece = random_piece()
-        self.next_piece = random_piece()
-        self.fall_speed = 30
-        self.time_to_drop = self.fall_speed
-        self.running = False
-
-    def process_key_events(self, keys):
-
-        if K_LEFT in keys:
-            self.lateral_piece_move(-1)
-        elif K_RIGHT in keys:
-            self.lateral_piece_move(1)
-        elif K_DOWN in keys:
-            self.drop_piece()
-        elif K_UP in keys:
-            self.rotate_piece(1)
-            
-    def update(self):
-        
-        # Countdown to current piece drop
-        self.time_to_drop -= 1
-        if self.time_to_drop < 0:
-            self.time_to_drop = self.fall_speed
-            self.drop_piece(1)
-        
+        # What the last frame drew, for dirty rect rendering
+        self.drawn = {}
+        self.drawn_next = None
+        self.next_rect = None
+
+    # Render the whole game screen
     def render(self, gfx, gallery):
-        
-        gfx.blit(gallery.background, (0, 0))
-        self.stats.render(gfx)
-        
-        # Render grid blocks
-        for x in xrange(GridSize.width):
-            for y in xrange(GridSize.height):
-                if self.grid[x][y] > 0:
-                    gallery.render_block(gfx, self.stats.level, self.grid[x][y] - 1, Point(x, y))
-                elif self.grid[x][y] < 0:
-                    gallery.render_ghost(gfx, (self.grid[x][y] * -1) - 1, Point(x, y))
-
-        # Render next blocks
-        for y in xrange(len(self.next_piece.grid)):
-            for x in xrange(len(self.next_piece.grid[y])):
-                if self.next_piece.grid[y][x]:
-                    pt = Point(x - self.next_piece.origin.x, y - self.next_piece.origin.y)
-                    gallery.render_next(gfx, self.stats.level, self.next_piece.grid[y][x] - 1, self.next_piece.size, pt)
-
-    # Translate piece by delta
-    def lateral_piece_move(self, dx):
-        
-        self.clear_grid_piece(self.curr_piece)
-        self.curr_piece.pos.x += dx
-        if not self.valid_move(self.curr_piece):
-            self.curr_piece.pos.x -= dx
+
+        self.scroll()
+        self.stack.update(self, gallery)
+        gfx.blit(self.stack.surface, (0, 0))
+        self.panel.render(gfx, self.stats)
+
+        # Render ghost and falling piece
+        self.drawn = self.frame_cells()
+        for pt, value in self.drawn.iteritems():
+            self.render_cell(gfx, gallery, pt, value)
+
+        self.render_next(gfx, gallery)
+
+    # Render only what changed since the last frame. Returns the dirty rects.
+    def render_dirty(self, gfx, gallery):
+
+        self.scroll()
+        surface = self.stack.surface
+        rects = self.panel.render_dirty(gfx, surface, self.stats)
+        cells = self.frame_cells()
+
+        # Repaint the whole board when the locked stack changed, otherwise
+        # only the cells the ghost and falling piece moved through
+        if self.stack.update(self, gallery):
+            rect = self.stack.rect
+            rects.append(gfx.blit(surface, rect, rect))
+            for pt, value in cells.iteritems():
+                self.render_cell(gfx, gallery, pt, value)
         else:
-            self.mixer.lateral.play()
-        self.set_grid_piece(self.curr_piece)
-    
-    # Rotate piece by delta
-    def rotate_piece(self, dr):
-        
-        self.clear_grid_piece(self.curr_piece)
-        
-        if dr < 0:
-            self.curr_piece.rotate_left()
-            if not self.valid_move(self.curr_piece):
-                self.curr_piece.rotate_right()
-            else:
-                self.mixer.rotate.play()
-        elif dr > 0:
-            self.curr_piece.rotate_right()
-            if not self.valid_move(self.curr_piece):
-                self.curr_piece.rotate_left()
-            else:
-                self.mixer.rotate.play()
-                
-        self.set_grid_piece(self.curr_piece)
-    
-    # Drop piece to the bottom
-    def drop_piece(self, incr=GridSize.height):
-        
-        self.clear_grid_piece(self.curr_piece)
-        
-        # Find grid bottom
-        place = False
-        for i in range(incr):
-            self.curr_piece.pos.y += 1
-            if not self.valid_move(self.curr_piece):
-                self.curr_piece.pos.y -= 1
-                place = True
-                break
-        
-        self.set_grid_piece(self.curr_piece)
-        if place:
-            if self.curr_piece.pos.y + self.curr_piece.origin.x <= 0:
-                self.end_game()
-            else:
-                self.place_piece(self.curr_piece)
-
-    # Place piece at grid bottom
-    def place_piece(self, piece):
-        
-        # Find cleared rows
-        cleared = []
-        for y in xrange(GridSize.height):
-            if (len([x for x in xrange(GridSize.width) if self.grid[x][y]]) == GridSize.width):
-                cleared.append(y)
-                
-        # Clear rows & shift down remains.
+            drawn = self.drawn
+            for pt, value in cells.iteritems():
+                if drawn.get(pt) != value:
+                    rect = self.layout.rect(*pt)
+                    rects.append(gfx.blit(surface, rect, rect))
+                    self.render_cell(gfx, gallery, pt, value)
+            for pt in drawn:
+                if pt not in cells:
+                    rect = self.layout.rect(*pt)
+                    rects.append(gfx.blit(surface, rect, rect))
+        self.drawn = cells
+
+        # Redraw next piece preview
+        if (self.next_piece.shape, self.stats.level) != self.drawn_next:
+            old = self.next_rect
+            gfx.blit(surface, old, old)
+            rects.append(self.render_next(gfx, gallery).union(old))
+
+        return rects
+
+    # Scroll the layout to keep the falling piece in view, repainting the
+    # stack if it moved
+    def scroll(self):
+        piece = self.curr_piece
+        size = piece.size
+        if self.layout.follow(piece.x + size.width / 2, max(0, piece.y + size.height)):
+            self.stack.stale = True
+
+    # Cells in view of the ghost and falling piece keyed by grid [x,y].
+    # Ghost cells are negative and the piece covers any overlap.
+    def frame_cells(self):
+
+        cells = {}
+        piece = self.curr_piece
+        visible = self.layout.visible
+        for x, y, value in piece.state.cells:
+            if visible(piece.x + x, self.ghost_y + y):
+                cells[(piece.x + x, self.ghost_y + y)] = -value
+        for x, y, value in piece.state.cells:
+            if visible(piece.x + x, piece.y + y):
+                cells[(piece.x + x, piece.y + y)] = value
+        return cells
+
+    def render_cell(self, gfx, gallery, pt, value):
+        if value > 0:
+            gallery.render_block(gfx, self.stats.level, value - 1, Point(*pt), self.layout)
+        else:
+            gallery.render_ghost(gfx, -value - 1, Point(*pt), self.layout)
+
+    # Render next blocks, returning the rect they cover
+    def render_next(self, gfx, gallery):
+
+        state = self.next_piece.state
+        rect = None
+        for x, y, value in state.cells:
+            pt = Point(x - state.origin.x, y - state.origin.y)
+            block = gallery.render_next(gfx, self.stats.level, value - 1, state.size, pt)
+            rect = block if rect is None else rect.union(block)
+
+        self.drawn_next = (self.next_piece.shape, self.stats.level)
+        self.next_rect = rect
+        return rect
+
+    def new_game(self, seed=None):
+        self.reset(seed)
+
+    # Restore a snapshot and repaint the stack, which it may have changed
+    def restore(self, snapshot):
+        Engine.restore(self, snapshot)
+        self.stack.stale = True
+
+# Background with the locked blocks drawn on it, kept offscreen and only
+# redrawn when pieces lock or the level changes the block palette.
+class StackView(Observer):
+
+    def __init__(self):
+        self.surface = None
+        self.rect = None
+        self.level = None
+        self.stale = True
+        self.locked = []
+
+    def on_start(self, engine):
+        self.stale = True
+
+    # Without cleared rows, only the locked piece's cells need drawing
+    def on_lock(self, engine, cleared):
         if cleared:
-            for row in cleared:
-                for x in xrange(GridSize.width):
-                    self.grid[x][row] = 0
-            for row in cleared:
-                self.shift_row_down(row)
-            
-        # Update statistics.
-        self.mixer.play_dropped(len(cleared))
-        if self.stats.update(len(cleared)):
-            self.mixer.level_up.play()
-            self.update_speed()
-            
-        self.new_piece()        
-    
-    def update_speed(self):
-        if self.fall_speed >= 2:
-            if self.fall_speed < 5:
-                self.fall_speed -= 1
-            elif self.fall_speed < 10:
-                self.fall_speed -= 2
-            else:
-                self.fall_speed -= 3
-            
-    # Shift above rows down from cleared row.
-    def shift_row_down(self, row):
-        for x in xrange(GridSize.width):
-            for y in reversed(xrange(row)):
-                self.grid[x][y + 1] = self.grid[x][y]
-                self.grid[x][y] = 0
-
-    # Set piece values into grid.                
-    def set_grid_piece(self, piece):
-        
-        # Find and set piece ghost grid points
-        yorig = piece.pos.y
-        for y in xrange(GridSize.height - piece.pos.y):
-            piece.pos.y += 1
-            if not self.valid_move(piece):
-                piece.pos.y -= 1
-                break
-        
-        for y in xrange(len(piece.grid)):
-            for x in xrange(len(piece.grid[y])):
-                if piece.grid[y][x]:
-                    self.grid[piece.pos.x + x][piece.pos.y + y] = (piece.grid[y][x] * -1)
-        
-        # Set grid values for piece.
-        piece.pos.y = yorig
-        for y in xrange(len(piece.grid)):
-            for x in xrange(len(piece.grid[y])):
-                if piece.grid[y][x] and piece.pos.y + y >= 0:
-                    self.grid[piece.pos.x + x][piece.pos.y + y] = piece.grid[y][x]
-    
-    # Remove piece values from grid.
-    def clear_grid_piece(self, piece):
-        
-        # Clear ghost grid points.
-        for x in xrange(GridSize.width):
-            for y in xrange(GridSize.height):
-                if self.grid[x][y] < 0:
-                    self.grid[x][y] = 0
-        
-        # Clear piece grid points.
-        for y in xrange(len(piece.grid)):
-            for x in xrange(len(piece.grid[y])):
-                if piece.grid[y][x] and piece.pos.y + y >= 0:
-                    self.grid[piece.pos.x + x][piece.pos.y + y] = 0
-    
-    # Check if piece can be moved to new location
-    def valid_move(self, piece):
-        
-        for y in xrange(len(piece.grid)):
-            for x in xrange(len(piece.grid[y])):
-
-                pt = Point(piece.pos.x + x, piece.pos.y + y)
-                if piece.grid[y][x] and pt.y >= 0:
-                    if pt.x < 0 or pt.x >= GridSize.width or pt.y >= GridSize.height:
-                        return False
-                    if self.grid[pt.x][pt.y]:
-                        return False
+            self.stale = True
+        elif not self.stale:
+            piece = engine.curr_piece
+            for x, y, value in piece.state.cells:
+                if piece.y + y >= 0:
+                    self.locked.append((piece.x + x, piece.y + y, value))
+
+    # Bring the surface up to date. Returns True if anything was drawn.
+    def update(self, engine, gallery):
+
+        level = engine.stats.level
+        if self.surface is None:
+            self.surface = gallery.background.copy()
+            self.rect = engine.layout.area()
+        elif not self.stale and level == self.level:
+            if not self.locked:
+                return False
+            for x, y, value in self.locked:
+                gallery.render_block(self.surface, level, value - 1, Point(x, y), engine.layout)
+            self.locked = []
+            return True
+
+        # Draw the locked blocks in view
+        layout = engine.layout
+        self.surface.blit(gallery.background, (0, 0))
+        for x in xrange(layout.left, layout.left + layout.columns):
+            column = engine.grid[x]
+            for y in xrange(layout.top, layout.top + layout.rows):
+                if column[y]:
+                    gallery.render_block(self.surface, level, column[y] - 1, Point(x, y), layout)
+        self.level = level
+        self.stale = False
+        self.locked = []
         return True
-    
-    def new_piece(self):
-        self.curr_piece = self.next_piece
-        self.next_piece = random_piece()
-        if not self.valid_move(self.curr_piece):
-            self.end_game()
-        self.set_grid_piece(self.curr_piece)
-    
-    def new_game(self):
-        self.grid = [[0 for y in xrange(GridSize.height)] for x in xrange(GridSize.width)]
-        self.stats = Statistics()
-        self.new_piece()
-        self.mixer.start.play()
-        self.mixer.loop_music()
-        self.fall_speed = 30
-        self.time_to_drop = self.fall_speed
-        self.running = True
-        
-    def end_game(self):
-        self.mixer.game_over.play()
-        self.running = False
-        
-    def game_over(self):
-        return not self.running
-
-class Statistics(object):
-    
-    Scores = {
-        0: 10, 
-        1: 100, 
-        2: 300, 
-        3: 500, 
-        4: 1000
-    }
-    
+
+class StatsPanel(object):
+
     def __init__(self):
-        self.score = 0
-        self.level = 0
-        self.lines = 0
-        
-    # Render statistics values
-    def render(self, gfx):
-
-        font = pygame.font.SysFont("OCR A Extended", 14, True)
-        label = font.render("LEVEL", 1, (255, 255, 255))
+        self.values = None
+        self.rects = []
+
+    # Render statistics labels and values
+    def render(self, gfx, stats):
+
+        label = text.render("LEVEL", 14, (255, 255, 255), True)
         gfx.blit(label, (70 - (label.get_width() / 2), 190))
-        label = font.render("LINES", 1, (255, 255, 255))
+        label = text.render("LINES", 14, (255, 255, 255), True)
         gfx.blit(label, (70 - (label.get_width() / 2), 260))
-        
-        font = pygame.font.SysFont("OCR A Extended", 28)
-        label = font.render(repr(self.score), 1, (255, 255, 255))
-        gfx.blit(label, (340 - label.get_width(), 5))
-        label = font.render(repr(self.level), 1, (255, 255, 255))
-        gfx.blit(label, (70 - (label.get_width() / 2), 207))
-        label = font.render(repr(self.lines), 1, (255, 255, 255))
-        gfx.blit(label, (70 - (label.get_width() / 2), 277))
-
-    # Update stats based on # cleared lines
-    def update(self, cleared):
-        self.score += self.Scores[cleared]
-        self.lines += cleared
-        if self.lines / 10 > self.level:
-            self.level += 1
-            return True
-        else:
-            return False
+
+        self.render_values(gfx, stats)
+
+    # Render statistics values, returning the rects they cover
+    def render_values(self, gfx, stats):
+
+        label = text.render(repr(stats.score), 28, (255, 255, 255))
+        rects = [gfx.blit(label, (340 - label.get_width(), 5))]
+        label = text.render(repr(stats.level), 28, (255, 255, 255))
+        rects.append(gfx.blit(label, (70 - (label.get_width() / 2), 207)))
+        label = text.render(repr(stats.lines), 28, (255, 255, 255))
+        rects.append(gfx.blit(label, (70 - (label.get_width() / 2), 277)))
+
+        self.values = (stats.score, stats.level, stats.lines)
+        self.rects = rects
+        return rects
+
+    # Redraw values if any changed since the last render. Returns the dirty rects.
+    def render_dirty(self, gfx, background, stats):
+
+        if (stats.score, stats.level, stats.lines) == self.values:
+            return []
+
+        old = self.rects
+        for rect in old:
+            gfx.blit(background, rect, rect)
+        return old + self.render_values(gfx, stats)
@@ -1,33 +1,132 @@
 import os
 import pygame
+from tetris import bundle
 from tetris.util import Point, Dimension
+from tetris.assets import Loader
 
 # Image dimensions
 BlockSize = Dimension(20, 20)
 BackgroundSize = Dimension(480, 450)
+
+# Position of the grid's top-left block on screen
+GridOffset = Point(140, 40)
+
+# Screen area the grid is drawn in, as (x, y, width, height), and the
+# fewest pixels across a cell is drawn with
+BoardArea = (GridOffset.x, GridOffset.y, 200, 400)
+MinCellSize = 4
+
+# Centre of the next piece preview on screen
+NextCenter = Point(411, 84)
+
+# Where grid cells are drawn on screen. Grids that don't fit the board
+# area at full block size are scaled down, to no less than MinCellSize
+# pixels a cell, and what still doesn't fit scrolls to follow the piece.
+class Layout(object):
+
+    def __init__(self, width, height):
+        x, y, area_width, area_height = BoardArea
+        self.width = width
+        self.height = height
+        self.cell = max(MinCellSize, min(BlockSize.width, area_width / width, area_height / height))
+        self.columns = min(width, area_width / self.cell)
+        self.rows = min(height, area_height / self.cell)
+        self.origin = Point(x + (area_width - self.columns * self.cell) / 2,
+                            y + (area_height - self.rows * self.cell) / 2)
+        self.left = 0
+        self.top = 0
+
+    # Scroll a page so cell [x,y] is in view, keeping a margin of rows below
+    # it. Returns True if the view moved.
+    def follow(self, x, y):
+        left, top = self.left, self.top
+        margin = self.rows / 4
+        if not left <= x < left + self.columns:
+            self.left = max(0, min(self.width - self.columns, x - self.columns / 2))
+        if y < top or y >= top + self.rows - margin:
+            self.top = max(0, min(self.height - self.rows, y - self.rows / 3))
+        return (left, top) != (self.left, self.top)
+
+    def visible(self, x, y):
+        return self.left <= x < self.left + self.columns and self.top <= y < self.top + self.rows
+
+    # Screen rect of cell [x,y]
+    def rect(self, x, y):
+        cell = self.cell
+        return pygame.Rect(self.origin.x + (x - self.left) * cell,
+                           self.origin.y + (y - self.top) * cell, cell, cell)
+
+    # Screen rect of every cell in view
+    def area(self):
+        return pygame.Rect(self.origin.x, self.origin.y, self.columns * self.cell, self.rows * self.cell)
+
+# Layout of the default 10x20 grid
+DefaultLayout = Layout(10, 20)
     
-# Load an image from the file system
+# Decode an image from the asset bundle, or the file system if it isn't
+# bundled. Safe off the main thread.
+def decode(filename):
+    pack = bundle.default()
+    if pack and filename in pack:
+        return pack.image(filename)
+    return pygame.image.load(os.path.join(bundle.ImagePath, filename))
+
+# Decode an image (bundle or file system) and convert it to the display format
 def load(filename):
-    return pygame.image.load(os.path.join("images", filename)).convert()
+    return decode(filename).convert()
 
+# The splash image loads up front for the menu. The background and block
+# sprites are decoded by the loader and converted and sliced the first
+# time the game draws them.
 class Gallery(object):
     
-    def __init__(self):
-        
+    def __init__(self, loader=None):
+
+        loader = loader or Loader(threaded=False)
         self.splash = load("splash.png")
-        self.background = load("tetris-background.png")
-        self.blocks = {}
-        self.fading = {}
-        
+        self.background_image = loader.submit("tetris-background.png", decode, "tetris-background.png")
+        self.blocksheet_image = loader.submit("blocks.png", decode, "blocks.png")
+        self.converted_background = None
+        self.block_sets = None
+        self.fading_sets = None
+
+    @property
+    def background(self):
+        if self.converted_background is None:
+            self.converted_background = self.background_image.get().convert()
+        return self.converted_background
+
+    @property
+    def blocks(self):
+        if self.block_sets is None:
+            self.load_blocks()
+        return self.block_sets
+
+    @property
+    def fading(self):
+        if self.fading_sets is None:
+            self.load_blocks()
+        return self.fading_sets
+
+    # Wait for and prepare everything a game draws
+    def prepare(self):
+        self.background
+        self.blocks
+
+    def load_blocks(self):
+
+        self.block_sets = {}
+        self.fading_sets = {}
+
         # Parse blocks from sprite sheet
         width, height = BlockSize.width, BlockSize.height
-        blocksheet = SpriteSheet("blocks.png")
+        blocksheet = SpriteSheet(self.blocksheet_image.get().convert())
         for level in xrange(11):
             blockset = []
             for index in xrange(3):
                 sub = blocksheet.subimage(level * width, index * height, width, height)
                 blockset.append(Block(sub))
-            self.blocks[level] = blockset
+            self.block_sets[level] = blockset
             
         # Parse fading blocks from sprite sheet
         xoff = BlockSize.width * 11
@@ -36,64 +135,64 @@ class Gallery(object):
             for fade in xrange(10):
                 sub = blocksheet.subimage(fade * width + xoff, index * height, width, height)
                 blockset.append(Block(sub))
-            self.fading[index] = blockset
+            self.fading_sets[index] = blockset
 
     # Render a block with level & index at specified grid point.
-    def render_block(self, gfx, level, index, pt):
+    def render_block(self, gfx, level, index, pt, layout=DefaultLayout):
         level = level % 11
         if level in self.blocks and index >= 0 and index < 3:
-            self.blocks[level][index].render(gfx, pt)
+            return self.blocks[level][index].render(gfx, pt, layout)
 
     # Render a next block with an index at specified grid point.
     def render_next(self, gfx, level, index, size, pt):
         level = level % 11
         if level in self.blocks and index >= 0 and index < 3:
-            self.blocks[level][index].render_next(gfx, size, pt)
+            return self.blocks[level][index].render_next(gfx, size, pt)
 
     # Render a fading block with an index and fade at specified grid point.
-    def render_fading(self, gfx, index, fade, pt):
+    def render_fading(self, gfx, index, fade, pt, layout=DefaultLayout):
         if index in self.fading and fade >= 0 and fade <= 10:
-            self.fading[index][fade].render(gfx, pt)
+            return self.fading[index][fade].render(gfx, pt, layout)
 
     # Render a ghost block with an index at specified grid point
-    def render_ghost(self, gfx, index, pt):
+    def render_ghost(self, gfx, index, pt, layout=DefaultLayout):
         if index in self.fading:
             fade = 3 if index == 1 else 4
-            self.fading[index][fade].render(gfx, pt)
+            return self.fading[index][fade].render(gfx, pt, layout)
 
+# A block image, with copies scaled to each cell size it is drawn at.
 class Block(object):
     
     def __init__(self, image):
         self.image = image
+        self.scaled = {BlockSize.width: image}
 
-    # Render the block at specified grid [x,y] indices
-    def render(self, gfx, pt):
-        pos = self.grid_to_pos(pt)
-        gfx.blit(self.image, pos.tuple())
+    # Render the block at specified grid [x,y] indices, if in view
+    def render(self, gfx, pt, layout=DefaultLayout):
+        if not layout.visible(pt.x, pt.y):
+            return None
+        image = self.scaled.get(layout.cell)
+        if image is None:
+            image = self.scaled[layout.cell] = pygame.transform.scale(self.image, (layout.cell, layout.cell))
+        return gfx.blit(image, layout.rect(pt.x, pt.y))
         
     # Render the next block at specified grid [x,y] indices
     def render_next(self, gfx, size, pt):
         pos = self.next_to_pos(size, pt)
-        gfx.blit(self.image, pos.tuple())
+        return gfx.blit(self.image, pos.tuple())
         
-    # Convert grid point to its [x,y] position coordinates
-    def grid_to_pos(self, pt):
-        x = pt.x * BlockSize.width + 140
-        y = pt.y * BlockSize.height + 40
-        return Point(x, y)
-    
-    # Cconvert next grid point to its [x,y] position coordinates
+    # Convert next grid point to its [x,y] position coordinates
     def next_to_pos(self, size, pt):
         center = Point((size.width * BlockSize.width) / 2, (size.height * BlockSize.height) / 2)
-        offset = Point(411 - center.x, 84 - center.y)
+        offset = Point(NextCenter.x - center.x, NextCenter.y - center.y)
         x = pt.x * BlockSize.width + offset.x
         y = pt.y * BlockSize.height + offset.y
         return Point(x, y)
 
 class SpriteSheet(object):
     
-    def __init__(self, filename):
-        self.sheet = load(filename)
+    def __init__(self, sheet):
+        self.sheet = sheet
         
     # Get a subimage from the sheet.
     def subimage(self, x, y, width, height):
@@ -1,106 +1,140 @@
 import random
 from tetris.util import Point, Dimension
 
-def random_piece():
-    pieces = [SquarePiece, IPiece, JPiece, LPiece, TPiece, SPiece, ZPiece]
-    return random.choice(pieces)()
+# One immutable rotation of a piece grid. Everything derived from the grid
+# is computed once here, so rotating a piece is just an index change.
+class Rotation(object):
 
-# A 4x4 matrix representing a grid piece
+    __slots__ = ('grid', 'cells', 'masks', 'bottoms', 'origin', 'size')
+
+    def __init__(self, grid, size):
+        self.grid = tuple(tuple(row) for row in grid)
+        self.size = size
+
+        # Filled cells as (x, y, value) and non-empty rows as (row, bitmask)
+        cells = []
+        masks = []
+        for y in xrange(len(self.grid)):
+            mask = 0
+            for x in xrange(len(self.grid[y])):
+                if self.grid[y][x]:
+                    cells.append((x, y, self.grid[y][x]))
+                    mask |= 1 << x
+            if mask:
+                masks.append((y, mask))
+        self.cells = tuple(cells)
+        self.masks = tuple(masks)
+
+        # Lowest filled row of each occupied column as (x, y)
+        bottoms = {}
+        for x, y, value in cells:
+            bottoms[x] = max(bottoms.get(x, y), y)
+        self.bottoms = tuple(sorted(bottoms.items()))
+
+        # First non-empty column and row
+        self.origin = Point(min(x for x, y, v in cells), min(y for x, y, v in cells))
+
+# A piece type: its spawn position and table of rotations, built once.
+class Shape(object):
+
+    def __init__(self, x, y, width, height, grid):
+        self.spawn = Point(x, y)
+        self.rotations = []
+        size = Dimension(width, height)
+        for r in xrange(4):
+            self.rotations.append(Rotation(grid, size))
+            grid = zip(*grid[::-1])
+            size = size.rotate()
+        self.rotations = tuple(self.rotations)
+
+SquareShape = Shape(3, -1, 2, 2,
+                    [[0, 0, 0, 0],
+                     [0, 1, 1, 0],
+                     [0, 1, 1, 0],
+                     [0, 0, 0, 0]])
+
+IShape = Shape(3, -2, 4, 1,
+               [[0, 0, 0, 0],
+                [0, 0, 0, 0],
+                [1, 1, 1, 1],
+                [0, 0, 0, 0],
+                [0, 0, 0, 0]])
+
+JShape = Shape(3, -1, 3, 2,
+               [[0, 0, 0, 0],
+                [2, 2, 2, 0],
+                [0, 0, 2, 0],
+                [0, 0, 0, 0]])
+
+LShape = Shape(2, -1, 3, 2,
+               [[0, 0, 0, 0],
+                [0, 2, 2, 2],
+                [0, 2, 0, 0],
+                [0 ,0, 0, 0]])
+
+TShape = Shape(2, -2, 3, 2,
+               [[0, 0, 0, 0, 0],
+                [0, 0, 0, 0, 0],
+                [0, 1, 1, 1, 0],
+                [0, 0, 1, 0, 0],
+                [0, 0, 0, 0, 0]])
+
+SShape = Shape(2, -1, 3, 2,
+               [[0, 0, 0, 0, 0],
+                [0, 0, 3, 3, 0],
+                [0, 3, 3, 0, 0],
+                [0, 0, 0, 0, 0]])
+
+ZShape = Shape(2, -1, 3, 2,
+               [[0, 0, 0, 0, 0],
+                [0, 3, 3, 0, 0],
+                [0, 0, 3, 3, 0],
+                [0, 0, 0, 0, 0]])
+
+Shapes = (SquareShape, IShape, JShape, LShape, TShape, SShape, ZShape)
+
+# Pick a random shape, drawing from rng when given for reproducible games
+def random_shape(rng=random):
+    return rng.choice(Shapes)
+
+def random_piece(rng=random):
+    return Piece(random_shape(rng))
+
+# A piece on the grid: a shape, its rotation index and grid position.
 class Piece(object):
 
-    def __init__(self, x, y, width, height):
-        self.grid = []
-        self.pos = Point(x, y)
-        self.origin = Point(0, 0)
-        self.size = Dimension(width, height)
-    
-    # Set the grid values.
-    def set(self, grid):
-        self.grid = grid
-        self.origin = Point(self.left(), self.top())
+    __slots__ = ('shape', 'rotation', 'x', 'y')
+
+    def __init__(self, shape):
+        self.spawn(shape)
+
+    # Reset the piece to a shape's spawn position and rotation.
+    def spawn(self, shape):
+        self.shape = shape
+        self.rotation = 0
+        self.x = shape.spawn.x
+        self.y = shape.spawn.y
+
+    @property
+    def state(self):
+        return self.shape.rotations[self.rotation]
+
+    @property
+    def grid(self):
+        return self.shape.rotations[self.rotation].grid
+
+    @property
+    def origin(self):
+        return self.shape.rotations[self.rotation].origin
+
+    @property
+    def size(self):
+        return self.shape.rotations[self.rotation].size
 
     # Rotate piece grid counter clockwise
     def rotate_left(self):
-        rotated = zip(*self.grid)[::-1]
-        self.set(rotated)
-        self.size = self.size.rotate()
-        
+        self.rotation = (self.rotation - 1) & 3
+
     # Rotate piece grid clockwise
     def rotate_right(self):
-        rotated = zip(*self.grid[::-1])
-        self.set(rotated)
-        self.size = self.size.rotate()
-
-    # Return the first non-empty row
-    def top(self):
-        for y in xrange(len(self.grid)):
-            if len([x for x in xrange(len(self.grid[y])) if self.grid[y][x]]):
-                return y
-        return 0
-    
-    # Return the first non-empty column
-    def left(self):
-        left = 5
-        for y in xrange(len(self.grid)):
-            for x in xrange(len(self.grid[y])):
-                if self.grid[y][x] and x < left:
-                    left = x
-        return left
-
-class SquarePiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 3, -1, 2, 2)
-        self.set([[0, 0, 0, 0],
-                  [0, 1, 1, 0],
-                  [0, 1, 1, 0],
-                  [0, 0, 0, 0]])
-
-class IPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 3, -2, 4, 1)
-        self.set([[0, 0, 0, 0],
-                  [0, 0, 0, 0],
-                  [1, 1, 1, 1],
-                  [0, 0, 0, 0],
-                  [0, 0, 0, 0]])
-    
-class JPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 3, -1, 3, 2)
-        self.set([[0, 0, 0, 0],
-                  [2, 2, 2, 0],
-                  [0, 0, 2, 0],
-                  [0, 0, 0, 0]])
-        
-class LPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 2, -1, 3, 2)
-        self.set([[0, 0, 0, 0],
-                  [0, 2, 2, 2],
-                  [0, 2, 0, 0],
-                  [0 ,0, 0, 0]])
-        
-class TPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 2, -2, 3, 2)
-        self.set([[0, 0, 0, 0, 0],
-                  [0, 0, 0, 0, 0],
-                  [0, 1, 1, 1, 0],
-                  [0, 0, 1, 0, 0],
-                  [0, 0, 0, 0, 0]])
-        
-class SPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 2, -1, 3, 2)
-        self.set([[0, 0, 0, 0, 0],
-                  [0, 0, 3, 3, 0],
-                  [0, 3, 3, 0, 0],
-                  [0, 0, 0, 0, 0]])
-                
-class ZPiece(Piece):
-    def __init__(self):
-        Piece.__init__(self, 2, -1, 3, 2)
-        self.set([[0, 0, 0, 0, 0],
-                  [0, 3, 3, 0, 0],
-                  [0, 0, 3, 3, 0],
-                  [0, 0, 0, 0, 0]])
+        self.rotation = (self.rotation + 1) & 3
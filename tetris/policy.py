@@ -0,0 +1,30 @@
+import random
+from tetris.engine import NoAction, ShiftLeft, ShiftRight, SoftDrop, HardDrop, RotateLeft, RotateRight
+
+# Chooses the actions for each engine step. Policies are reused across
+# games, so any per-game state is set up in reset.
+class Policy(object):
+
+    def reset(self, engine, seed):
+        pass
+
+    def act(self, engine):
+        return NoAction
+
+    # Extra numeric results to report for the game just played
+    def report(self):
+        return {}
+
+# Presses random keys, mostly leaving the piece to fall.
+class RandomPolicy(Policy):
+
+    Actions = [NoAction] * 6 + [ShiftLeft, ShiftRight, RotateLeft, RotateRight, SoftDrop, HardDrop]
+
+    def __init__(self):
+        self.random = random.Random()
+
+    def reset(self, engine, seed):
+        self.random.seed(seed)
+
+    def act(self, engine):
+        return self.random.choice(self.Actions)
@@ -0,0 +1,156 @@
+import zlib
+import struct
+from fractions import Fraction
+from tetris.util import Dimension
+from tetris.engine import Engine, Observer, GridSize
+from tetris.policy import Policy
+
+# Replay files start with a header holding the seed, signed, the grid size, the
+# number of steps played, the final state, the lock delay (-1 for none) and
+# the number of gravity levels, then the rows and ticks of each gravity
+# level, followed by one (step, actions) entry for every step that had any
+# action. Version 2 replays end the header at the final state, and hold
+# the seed unsigned.
+Magic = 'TRPL'
+Version = 3
+Header = struct.Struct('<4sBqHHIIQIIIIiH')
+Gravity = struct.Struct('<II')
+Entry = struct.Struct('<IB')
+HeaderV2 = struct.Struct('<4sBQHHIIQIIII')
+
+# Seeds a replay can hold
+MinSeed, MaxSeed = -2 ** 63, 2 ** 63 - 1
+
+# Seed from the command line, if a replay can hold it
+def parse_seed(text):
+    seed = int(text)
+    if not MinSeed <= seed <= MaxSeed:
+        raise ValueError("seed must fit in a signed 64-bit number")
+    return seed
+
+# Final score, lines, level, pieces and a checksum of the grid and the
+# falling piece. Two games ending in the same state have the same result.
+def final_state(engine):
+    stats, piece = engine.stats, engine.curr_piece
+    cells = bytearray(value for column in engine.grid for value in column)
+    checksum = zlib.crc32(str(cells))
+    checksum = zlib.crc32(struct.pack('<Biii', piece.rotation, piece.x, piece.y, engine.time_to_drop), checksum)
+    return (stats.score, stats.lines, stats.level, stats.pieces, checksum & 0xffffffff)
+
+# A game's seed and input log, with the gravity and lock delay it was
+# played under.
+class Replay(object):
+
+    def __init__(self, seed, ticks=0, inputs=None, state=None, size=GridSize,
+                 gravity=None, lock_delay=None):
+        self.seed = seed
+        self.width, self.height = size.width, size.height
+        self.ticks = ticks
+        self.inputs = inputs if inputs is not None else []
+        self.state = state
+        self.gravity = gravity
+        self.lock_delay = lock_delay
+
+    def save(self, path):
+        gravity = self.gravity or ()
+        lock_delay = -1 if self.lock_delay is None else self.lock_delay
+        with open(path, 'wb') as f:
+            f.write(Header.pack(Magic, Version, self.seed, self.width, self.height,
+                                self.ticks, len(self.inputs), *(tuple(self.state) + (lock_delay, len(gravity)))))
+            f.write(''.join(Gravity.pack(rows.numerator, rows.denominator) for rows in gravity))
+            f.write(''.join(Entry.pack(tick, actions) for tick, actions in self.inputs))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        fields = HeaderV2.unpack_from(data)
+        if fields[0] != Magic or fields[1] not in (2, Version):
+            raise ValueError("%s is not a version %d replay" % (path, Version))
+        gravity, lock_delay, offset = None, None, HeaderV2.size
+        if fields[1] == Version:
+            fields = Header.unpack_from(data)
+            lock_delay, levels = fields[12:]
+            gravity = tuple(Fraction(*Gravity.unpack_from(data, Header.size + i * Gravity.size))
+                            for i in xrange(levels)) or None
+            lock_delay = None if lock_delay < 0 else lock_delay
+            offset = Header.size + levels * Gravity.size
+        seed, width, height, ticks, count = fields[2:7]
+        state = fields[7:12]
+        inputs = [Entry.unpack_from(data, offset + i * Entry.size) for i in xrange(count)]
+        return cls(seed, ticks, inputs, state, Dimension(width, height), gravity, lock_delay)
+
+    # Play the replay on an engine as fast as possible, skipping over the
+    # steps without input. Returns the engine.
+    def play(self, engine=None):
+
+        engine = engine or Engine(width=self.width, height=self.height,
+                                  gravity=self.gravity, lock_delay=self.lock_delay)
+        engine.reset(self.seed)
+        tick = 0
+        for at, actions in self.inputs:
+            engine.idle(at - tick)
+            engine.step(actions)
+            tick = at + 1
+        engine.idle(self.ticks - tick)
+        return engine
+
+    # Check an engine ended in the recorded state
+    def matches(self, engine):
+        return final_state(engine) == tuple(self.state)
+
+# Records the game played on an engine. Each new game starts a new replay,
+# which is complete once the game is over or finish is called.
+class Recorder(Observer):
+
+    def __init__(self):
+        self.replay = None
+        self.engine = None
+
+    def on_start(self, engine):
+        self.replay = Replay(engine.seed, size=engine.size, gravity=engine.gravity,
+                             lock_delay=engine.lock_delay)
+        self.engine = engine
+
+    def on_step(self, engine, actions):
+        replay = self.replay
+        if actions:
+            replay.inputs.append((replay.ticks, actions))
+        replay.ticks += 1
+
+    def on_game_over(self, engine):
+        self.finish()
+
+    # Forget the last ticks, after the engine was rewound by as many. The
+    # rewound engine's state came from the same inputs, so the replay still
+    # plays back to it.
+    def rewind(self, ticks):
+        replay = self.replay
+        replay.ticks -= ticks
+        while replay.inputs and replay.inputs[-1][0] >= replay.ticks:
+            replay.inputs.pop()
+        replay.state = None
+
+    # Record the state the game stopped in and return the replay
+    def finish(self):
+        if self.replay:
+            self.replay.state = final_state(self.engine)
+        return self.replay
+
+# Presses the keys of a replay, one step at a time, so a replay can be
+# watched at game speed. Games must be started from the replay's seed on
+# a grid of its size, under its gravity and lock delay.
+class Playback(Policy):
+
+    def __init__(self, replay):
+        self.replay = replay
+        self.actions = dict(replay.inputs)
+        self.tick = 0
+
+    def reset(self, engine, seed):
+        self.tick = 0
+
+    def act(self, engine):
+        actions = self.actions.get(self.tick, 0)
+        self.tick += 1
+        return actions
@@ -0,0 +1,36 @@
+from tetris.engine import Observer, Snapshot, TickRate
+
+# Default seconds of play kept for rewinding
+RewindTime = 5.0
+
+# Snapshots of an engine before each of its last steps, in a ring buffer
+# allocated up front so recording a step copies into a snapshot already
+# there. Rewinding restores an earlier one and drops those after it.
+class Rewind(Observer):
+
+    def __init__(self, engine, seconds=RewindTime):
+        self.engine = engine
+        self.capacity = max(1, int(seconds * TickRate))
+        size = engine.size
+        self.snapshots = [Snapshot(size.width, size.height) for i in xrange(self.capacity)]
+        self.head = 0
+        self.count = 0
+        engine.attach(self)
+
+    def on_start(self, engine):
+        self.count = 0
+
+    def on_step(self, engine, actions):
+        engine.snapshot(self.snapshots[self.head])
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    # Step back up to a number of ticks. Returns how many were rewound.
+    def rewind(self, ticks=1):
+        ticks = min(ticks, self.count)
+        if ticks:
+            self.head = (self.head - ticks) % self.capacity
+            self.count -= ticks
+            self.engine.restore(self.snapshots[self.head])
+        return ticks
@@ -0,0 +1,158 @@
+import os
+import time
+import multiprocessing
+from multiprocessing.util import Finalize
+from tetris.engine import Engine, TickRate, GridSize
+from tetris.bot import Bot
+from tetris.policy import Policy, RandomPolicy
+from tetris.codec import Encoder, Decoder
+from tetris.telemetry import Telemetry, Writer
+
+# Policies selectable by name
+Policies = {
+    'idle': Policy,
+    'random': RandomPolicy,
+    'bot': Bot,
+}
+
+def make_policy(name):
+    return Policies[name]()
+
+# Fields reported for every game. Duration is in game seconds, wall is the
+# real time it took to simulate. Policies may report more.
+Fields = ('seed', 'score', 'lines', 'level', 'pieces', 'ticks', 'duration', 'wall')
+
+# Play one game to the end, or until max_ticks. Returns its result, with
+# the size of its codec stream in bytes when encoding, and whether the
+# stream decodes back to the game's final state.
+def play_game(engine, policy, seed, max_ticks=None, encode=False):
+
+    start = time.time()
+    encoder = None
+    if encode:
+        encoder = Encoder()
+        engine.attach(encoder)
+    engine.reset(seed)
+    policy.reset(engine, seed)
+
+    ticks = 0
+    while engine.running and (max_ticks is None or ticks < max_ticks):
+        engine.step(policy.act(engine))
+        if encoder:
+            encoder.tick(engine)
+        ticks += 1
+
+    stats = engine.stats
+    result = policy.report()
+    result.update({
+        'seed': seed,
+        'score': stats.score,
+        'lines': stats.lines,
+        'level': stats.level,
+        'pieces': stats.pieces,
+        'ticks': ticks,
+        'duration': ticks / float(TickRate),
+        'wall': time.time() - start
+    })
+    if encoder:
+        engine.detach(encoder)
+        data = encoder.finish()
+        decoder = Decoder(data)
+        while decoder.step():
+            pass
+        result['bytes'] = len(data)
+        result['decoded'] = int(decoder.tick == ticks and decoder.matches(engine))
+    return result
+
+# Engine, policy and telemetry of a pool worker, built once and reused for
+# every game
+worker = {}
+
+def init_worker(policy, max_ticks, width, height, encode, telemetry, gravity, lock_delay):
+    worker['engine'] = Engine(width=width, height=height, gravity=gravity, lock_delay=lock_delay)
+    worker['policy'] = make_policy(policy)
+    worker['max_ticks'] = max_ticks
+    worker['encode'] = encode
+    worker['telemetry'] = None
+    if telemetry:
+        worker['telemetry'] = open_telemetry(*telemetry)
+        worker['engine'].attach(worker['telemetry'])
+        Finalize(None, worker['telemetry'].close, exitpriority=10)
+
+# Telemetry for a worker, logging to its own file: path with the worker's
+# process id put before the extension
+def open_telemetry(path, format, max_bytes):
+    root, ext = os.path.splitext(path)
+    return Telemetry(Writer('%s.%d%s' % (root, os.getpid(), ext), format, max_bytes))
+
+def play_batch(seeds):
+    engine, policy, telemetry = worker['engine'], worker['policy'], worker['telemetry']
+    results = []
+    for seed in seeds:
+        results.append(play_game(engine, policy, seed, worker['max_ticks'], worker['encode']))
+        if telemetry:
+            telemetry.finish(engine)
+    return results
+
+# Play a game for each seed across a pool of worker processes. Seeds are
+# sent out in batches and results come back a batch at a time, in the
+# order batches finish. Telemetry, if given as (path, format, max_bytes),
+# is logged by each worker to its own file. Gravity and lock delay are as
+# for the engine.
+def run_games(seeds, policy='random', processes=None, batch_size=16, max_ticks=None,
+              width=GridSize.width, height=GridSize.height, encode=False, telemetry=None,
+              gravity=None, lock_delay=None):
+
+    seeds = list(seeds)
+    batches = [seeds[i:i + batch_size] for i in xrange(0, len(seeds), batch_size)]
+    pool = multiprocessing.Pool(processes, init_worker,
+                                (policy, max_ticks, width, height, encode, telemetry, gravity, lock_delay))
+    try:
+        for results in pool.imap_unordered(play_batch, batches):
+            yield results
+        pool.close()
+        pool.join()
+    finally:
+        pool.terminate()
+        pool.join()
+
+# Distribution of each result field over many games.
+class Summary(object):
+
+    Percentiles = (10, 50, 90)
+
+    def __init__(self):
+        self.values = {}
+
+    def add(self, result):
+        for field, value in result.iteritems():
+            if field != 'seed':
+                self.values.setdefault(field, []).append(value)
+
+    # Fields seen, standard ones first
+    def fields(self):
+        extra = sorted(field for field in self.values if field not in Fields)
+        return [field for field in Fields if field in self.values] + extra
+
+    def count(self):
+        return len(self.values.get('score', []))
+
+    # Mean, standard deviation, minimum, percentiles and maximum of a field
+    def distribution(self, field):
+        values = sorted(self.values[field])
+        if not values:
+            return None
+        n = len(values)
+        mean = sum(values) / float(n)
+        stdev = (sum((v - mean) ** 2 for v in values) / n) ** 0.5
+        percentiles = [values[min(n - 1, n * p / 100)] for p in self.Percentiles]
+        return [mean, stdev, values[0]] + percentiles + [values[-1]]
+
+    # Table of every field's distribution
+    def report(self):
+        columns = ['mean', 'stdev', 'min'] + ['p%d' % p for p in self.Percentiles] + ['max']
+        lines = ['%-16s' % 'field' + ''.join('%12s' % c for c in columns)]
+        for field in self.fields():
+            row = self.distribution(field)
+            lines.append('%-16s' % field + ''.join('%12.4g' % v for v in row))
+        return '\n'.join(lines)
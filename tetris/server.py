@@ -0,0 +1,290 @@
+import os
+import json
+import time
+import errno
+import socket
+import select
+from tetris.engine import Engine, TickRate
+from tetris.piece import Shapes
+from tetris.board import Pad
+from tetris.policy import RandomPolicy
+from tetris.codec import Encoder
+
+# Unsent bytes at which a client stops being read from and has its states
+# coalesced into the latest one, and the level it must drain below to resume
+HighWater = 64 * 1024
+LowWater = 16 * 1024
+
+# Most seconds of ticks to catch up on after a stall
+MaxLag = 0.25
+
+# A game played over a connection. Clients send lines of text:
+#   a FLAGS   press the action flags on the next tick
+#   r [SEED]  start a new game
+#   b         switch to the binary codec stream
+#   q         close the session
+# and receive a line of JSON whenever the game changed over a tick, with the
+# locked board as one bitmask per row after each lock. Binary clients get
+# codec records instead, restarting from a keyframe after being throttled.
+class Session(object):
+
+    def __init__(self, sock, seed=None):
+        self.sock = sock
+        self.engine = Engine()
+        self.engine.reset(seed)
+        self.actions = 0
+        self.inbuf = ''
+        self.outbuf = ''
+        self.throttled = False
+        self.latest = None
+        self.sent = None
+        self.board_pieces = None
+        self.encoder = None
+        self.stale = False
+        self.closed = False
+        if sock:
+            sock.setblocking(0)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    # Read what the client sent, handling each complete line
+    def read(self):
+        try:
+            data = self.sock.recv(4096)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            data = ''
+        if not data:
+            self.close()
+            return
+        lines = (self.inbuf + data).split('\n')
+        self.inbuf = lines.pop()
+        for line in lines:
+            self.handle(line.split())
+
+    def handle(self, words):
+        if not words:
+            return
+        try:
+            if words[0] == 'a':
+                self.actions |= int(words[1])
+            elif words[0] == 'r':
+                self.engine.reset(int(words[1]) if len(words) > 1 else None)
+                self.board_pieces = None
+            elif words[0] == 'b' and not self.encoder:
+                self.encoder = Encoder()
+                self.engine.attach(self.encoder)
+                self.encoder.keyframe(self.engine)
+            elif words[0] == 'q':
+                self.close()
+        except (IndexError, ValueError):
+            pass
+
+    # Apply the actions received since the last tick and advance the game
+    def step(self):
+        if self.engine.running:
+            self.engine.step(self.actions)
+            if self.encoder:
+                self.encoder.tick(self.engine)
+        self.actions = 0
+
+    # Game state for a client, with the board only if it changed
+    def state(self, tick):
+        engine = self.engine
+        piece, stats = engine.curr_piece, engine.stats
+        state = {
+            'tick': tick,
+            'running': engine.running,
+            'piece': [Shapes.index(piece.shape), piece.rotation, piece.x, piece.y],
+            'ghost': engine.ghost_y,
+            'next': Shapes.index(engine.next_piece.shape),
+            'score': stats.score,
+            'lines': stats.lines,
+            'level': stats.level
+        }
+        if stats.pieces != self.board_pieces:
+            state['board'] = [row >> Pad & ((1 << engine.size.width) - 1) for row in engine.board.rows]
+            self.board_pieces = stats.pieces
+        return state
+
+    # Queue this tick's state if the game changed. A throttled client keeps
+    # only the latest state, sent once it has drained.
+    def publish(self, tick):
+        if self.encoder:
+            self.publish_records()
+            return
+        state = self.state(tick)
+        key = (state['running'], state['piece'], state['score'], 'board' in state)
+        if key == self.sent:
+            return
+        self.sent = key
+        if self.throttled:
+            if self.latest and 'board' in self.latest and 'board' not in state:
+                state['board'] = self.latest['board']
+            self.latest = state
+        else:
+            self.outbuf += json.dumps(state, separators=(',', ':')) + '\n'
+            self.throttled = len(self.outbuf) > HighWater
+
+    # Queue the codec records of this tick. Records made while throttled are
+    # dropped, and a keyframe brings the client back in step.
+    def publish_records(self):
+        records = self.encoder.take()
+        if self.throttled:
+            self.stale = True
+            return
+        if self.stale:
+            self.encoder.keyframe(self.engine)
+            records = self.encoder.take()
+            self.stale = False
+        self.outbuf += records
+        self.throttled = len(self.outbuf) > HighWater
+
+    def write(self):
+        try:
+            sent = self.sock.send(self.outbuf)
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            self.close()
+            return
+        self.outbuf = self.outbuf[sent:]
+        if self.throttled and len(self.outbuf) < LowWater:
+            self.throttled = False
+            if self.latest:
+                self.outbuf += json.dumps(self.latest, separators=(',', ':')) + '\n'
+                self.latest = None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            if self.sock:
+                self.sock.close()
+
+# Hosts many sessions in one process. A single loop waits on every socket
+# and steps all sessions together on one shared tick, so adding a session
+# adds no timers. Tick costs are kept to report the load.
+class Server(object):
+
+    def __init__(self, tick_rate=TickRate):
+        self.tick_rate = tick_rate
+        self.listeners = []
+        self.sessions = []
+        self.tick = 0
+        self.busy = 0.0
+        self.overruns = 0
+        self.running = False
+
+    def listen_tcp(self, host, port):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((host, port))
+        self.listen(sock)
+        return sock.getsockname()
+
+    def listen_unix(self, path):
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        self.listen(sock)
+        return path
+
+    def listen(self, sock):
+        sock.listen(128)
+        sock.setblocking(0)
+        self.listeners.append(sock)
+
+    def accept(self, listener):
+        try:
+            sock, address = listener.accept()
+        except socket.error:
+            return
+        if sock.family == socket.AF_INET:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sessions.append(Session(sock))
+
+    # Step every session and queue their states
+    def step(self):
+        start = time.time()
+        self.tick += 1
+        for session in self.sessions:
+            session.step()
+            session.publish(self.tick)
+        self.busy += time.time() - start
+
+    # Serve until stop is called, or for a number of seconds
+    def run(self, duration=None):
+
+        period = 1.0 / self.tick_rate
+        next_tick = time.time()
+        end = None if duration is None else next_tick + duration
+        self.running = True
+
+        while self.running and (end is None or next_tick < end):
+
+            readers = self.listeners + [s for s in self.sessions if not s.throttled]
+            writers = [s for s in self.sessions if s.outbuf]
+            timeout = max(0.0, next_tick - time.time())
+            readable, writable, failed = select.select(readers, writers, [], timeout)
+
+            for item in readable:
+                if item in self.listeners:
+                    self.accept(item)
+                else:
+                    item.read()
+            for session in writable:
+                if not session.closed:
+                    session.write()
+            if any(session.closed for session in self.sessions):
+                self.sessions = [s for s in self.sessions if not s.closed]
+
+            now = time.time()
+            if now >= next_tick:
+                self.step()
+                next_tick += period
+                if now - next_tick > MaxLag:
+                    self.overruns += 1
+                    next_tick = now
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        for session in self.sessions:
+            session.close()
+        for sock in self.listeners:
+            sock.close()
+        self.sessions = []
+        self.listeners = []
+
+# Estimate how many sessions one core can step and publish at the tick
+# rate, from the cost of ticking count socketless sessions fed random input.
+# Returns (sessions, seconds per session tick).
+def capacity(count=500, ticks=300, tick_rate=TickRate):
+
+    sessions, policies = [], []
+    for seed in xrange(count):
+        session = Session(None, seed)
+        policy = RandomPolicy()
+        policy.reset(session.engine, seed)
+        sessions.append(session)
+        policies.append(policy)
+
+    elapsed = 0.0
+    for tick in xrange(ticks):
+        for session, policy in zip(sessions, policies):
+            session.actions = policy.act(session.engine)
+        start = time.time()
+        for session in sessions:
+            if not session.engine.running:
+                session.engine.reset(None)
+            session.step()
+            session.publish(tick)
+            session.outbuf = ''
+        elapsed += time.time() - start
+
+    cost = elapsed / (count * ticks)
+    return int(1.0 / (tick_rate * cost)), cost
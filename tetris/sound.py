@@ -1,53 +1,142 @@
 import os
+import time
 import pygame
+from tetris import bundle
+from tetris.engine import Observer
+from tetris.assets import Loader
 
+# Frequency, sample size, channels and buffer size the mixer plays at
+MixerSettings = (44100, -16, 2, 4096)
+
+# Load a sound from the asset bundle, or the file system if it isn't
+# bundled for this mixer format
 def load(filename):
-    return pygame.mixer.Sound(os.path.join('sounds', filename))
+    pack = bundle.default()
+    sound = pack.sound(filename) if pack and filename in pack else None
+    return sound or pygame.mixer.Sound(os.path.join(bundle.SoundPath, filename))
 
 def load_music(filename):
-    return pygame.mixer.music.load(os.path.join('sounds', filename))
+    return pygame.mixer.music.load(os.path.join(bundle.SoundPath, filename))
+
+# Sound effects by event name: file, priority, and the fewest seconds
+# between two plays. Each priority has one reserved channel, so a sound can
+# only cut off one of the same priority. Level up has a priority of its own,
+# as it comes with the lock sound of the lines that reached the level.
+Effects = {
+    'lateral': ('lateralmove.wav', 0, 0.05),
+    'rotate': ('rotate.wav', 0, 0.05),
+    'drop': ('drop.wav', 1, 0.0),
+    'clear': ('clear.wav', 1, 0.0),
+    'select': ('select.wav', 1, 0.0),
+    'start': ('start.wav', 2, 0.0),
+    'tetris': ('tetris.wav', 2, 0.0),
+    'level_up': ('levelup.wav', 3, 0.0),
+    'game_over': ('gameover.wav', 2, 0.0)
+}
+Priorities = 4
 
 class Sound(object):
-    def __init__(self, filename):
-        self.sound = load(filename)
-    def play(self):
-        self.sound.stop()
-        self.sound.play(0)
-    def stop(self):
-        self.sound.stop()
-
-class Mixer(object):
+    def __init__(self, loader, filename):
+        self.pending = loader.submit(filename, load, filename)
+    @property
+    def sound(self):
+        return self.pending.get()
+    def play(self, channel):
+        channel.play(self.sound)
+
+# Plays game sounds in response to engine events. Events are only posted
+# during game logic, coalescing repeats, and flush plays them once a frame:
+# the highest priority event of each channel, unless that sound played too
+# recently. While muted, posting does nothing. Sounds load through the
+# loader and are waited for the first time they play.
+class Mixer(Observer):
     
-    def __init__(self):
-        self.clear = Sound('clear.wav')
-        self.drop = Sound('drop.wav')
-        self.lateral = Sound('lateralmove.wav')
-        self.level_up = Sound('levelup.wav')
-        self.rotate = Sound('rotate.wav')
-        self.select = Sound('select.wav')
-        self.start = Sound('start.wav')
-        self.tetris = Sound('tetris.wav')
-        self.game_over = Sound('gameover.wav')
-        self.music = load_music('tetrismusic.wav')
+    def __init__(self, loader=None, muted=False):
+        loader = loader or Loader(threaded=False)
+        self.sounds = dict((name, Sound(loader, effect[0])) for name, effect in Effects.iteritems())
+        self.music = loader.submit('tetrismusic.wav', load_music, 'tetrismusic.wav')
+        self.muted = muted
+        self.channels = None
+        self.events = {}
+        self.played = {}
+        self.music_on = None
+
+    # Queue a sound effect for the next flush
+    def post(self, name):
+        if not self.muted:
+            self.events[name] = len(self.events)
 
     def loop_music(self):
-        pygame.mixer.music.play(-1, 0.0)
+        if not self.muted:
+            self.music_on = True
 
     def stop_music(self):
-        pygame.mixer.music.stop()
-                        
-    def pause(self):
-        pygame.mixer.pause()
-        
-    def unpause(self):
-        pygame.mixer.unpause()
-            
+        self.music_on = False
+
+    def mute(self, muted=True):
+        self.muted = muted
+        self.events.clear()
+        if muted:
+            self.music_on = False
+            if self.channels:
+                for channel in self.channels:
+                    channel.stop()
+
+    # Make the mixer calls for everything posted since the last flush
+    def flush(self):
+
+        if self.music_on is not None:
+            if self.music_on:
+                self.music.get()
+                pygame.mixer.music.play(-1, 0.0)
+            else:
+                pygame.mixer.music.stop()
+            self.music_on = None
+
+        if not self.events:
+            return
+        if self.channels is None:
+            pygame.mixer.set_reserved(Priorities)
+            self.channels = [pygame.mixer.Channel(i) for i in xrange(Priorities)]
+
+        # Latest posted event of each priority
+        chosen = {}
+        for name, order in sorted(self.events.iteritems(), key=lambda e: e[1]):
+            chosen[Effects[name][1]] = name
+        self.events.clear()
+
+        now = time.time()
+        for priority in sorted(chosen, reverse=True):
+            name = chosen[priority]
+            interval = Effects[name][2]
+            if interval and now - self.played.get(name, 0) < interval:
+                continue
+            self.played[name] = now
+            self.sounds[name].play(self.channels[priority])
+
     def play_dropped(self, cleared):
-        sounds = {
-            4: self.tetris,
-            3: self.clear,
-            2: self.clear,
-            1: self.clear,
-            0: self.drop
-        }
-        sounds[cleared].play()
+        if cleared == 4:
+            self.post('tetris')
+        elif cleared:
+            self.post('clear')
+        else:
+            self.post('drop')
+
+    def on_start(self, engine):
+        self.post('start')
+        self.loop_music()
+
+    def on_shift(self, engine):
+        self.post('lateral')
+
+    def on_rotate(self, engine):
+        self.post('rotate')
+
+    def on_lock(self, engine, cleared):
+        self.play_dropped(cleared)
+
+    def on_level_up(self, engine):
+        self.post('level_up')
+
+    def on_game_over(self, engine):
+        self.post('game_over')
@@ -0,0 +1,179 @@
+import os
+import json
+import Queue
+import threading
+from tetris.engine import Observer, TickRate
+from tetris.piece import Shapes
+
+# Fields of each piece event. Tick is the step the piece locked in and
+# ticks how many steps it was in play. Height is the stack height after
+# any rows cleared, and shape an index into the piece shapes.
+PieceFields = ('game', 'seed', 'piece', 'tick', 'ticks', 'shape', 'rotation', 'x', 'y',
+               'cleared', 'height', 'level')
+
+# Fields of each game summary. Levels holds the tick each level after the
+# first was reached, and ended is false for games stopped before game over.
+GameFields = ('game', 'seed', 'ticks', 'duration', 'pieces', 'score', 'lines', 'level',
+              'pps', 'apm', 'levels', 'ended')
+
+Fields = {'piece': PieceFields, 'game': GameFields}
+
+# Piece events are all integers, so a line is formatted straight from a row
+PieceLine = '{"type":"piece",' + ','.join('"%s":%%d' % field for field in PieceFields) + '}'
+
+ShapeIndex = dict((shape, i) for i, shape in enumerate(Shapes))
+
+# Output formats: a JSON line per event, or a JSON line per batch holding
+# each field's values as a column
+Formats = ('jsonl', 'columnar')
+
+# Events kept in memory before they go to the writer as a batch
+BatchSize = 4096
+
+# Bytes a log grows to before it is rotated, and rotated logs kept
+MaxBytes = 64 * 1024 * 1024
+Backups = 5
+
+# Writes batches of events to a log from a background thread, so the game
+# never waits on encoding or disk. When the log passes max_bytes it is
+# renamed to path.1, older logs moving up to path.N. An error in the thread
+# stops it writing and is raised again by close.
+class Writer(object):
+
+    def __init__(self, path, format='jsonl', max_bytes=MaxBytes, backups=Backups):
+        if format not in Formats:
+            raise ValueError("unknown telemetry format %r" % format)
+        self.path = path
+        self.format = format
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+        self.error = None
+        self.queue = Queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='telemetry')
+        self.thread.daemon = True
+        self.thread.start()
+
+    # Queue a batch of rows of one kind of event
+    def put(self, kind, rows):
+        self.queue.put((kind, rows))
+
+    def run(self):
+        while True:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            if self.error:
+                continue
+            try:
+                self.write(*batch)
+            except Exception as e:
+                self.error = e
+
+    def write(self, kind, rows):
+
+        fields = Fields[kind]
+        if self.format == 'columnar':
+            block = {'type': kind, 'count': len(rows), 'columns': dict(zip(fields, zip(*rows)))}
+            data = json.dumps(block, separators=(',', ':')) + '\n'
+        elif kind == 'piece':
+            data = '\n'.join(PieceLine % row for row in rows) + '\n'
+        else:
+            lines = []
+            for row in rows:
+                event = dict(zip(fields, row))
+                event['type'] = kind
+                lines.append(json.dumps(event, separators=(',', ':')))
+            data = '\n'.join(lines) + '\n'
+
+        self.file.write(data)
+        self.size += len(data)
+        if self.size >= self.max_bytes:
+            self.rotate()
+
+    def rotate(self):
+        self.file.close()
+        if self.backups:
+            for i in xrange(self.backups - 1, 0, -1):
+                if os.path.exists('%s.%d' % (self.path, i)):
+                    os.rename('%s.%d' % (self.path, i), '%s.%d' % (self.path, i + 1))
+            os.rename(self.path, self.path + '.1')
+        self.file = open(self.path, 'wb')
+        self.size = 0
+
+    # Write everything queued, then close the log
+    def close(self):
+        if self.thread:
+            self.queue.put(None)
+            self.thread.join()
+            self.thread = None
+            self.file.close()
+        if self.error:
+            raise self.error
+
+# Records an event for every piece locked and a summary of every game on
+# an engine, batched in memory and handed to a writer. A game stopped
+# before game over is summarized by finish.
+class Telemetry(Observer):
+
+    def __init__(self, writer, batch=BatchSize):
+        self.writer = writer
+        self.batch = batch
+        self.pieces = []
+        self.games = []
+        self.game = 0
+        self.playing = False
+        self.spawned = 0
+        self.levels = []
+
+    def on_start(self, engine):
+        self.game += 1
+        self.playing = True
+        self.spawned = 0
+        self.levels = []
+
+    def on_lock(self, engine, cleared):
+        piece, stats, board, ticks = engine.curr_piece, engine.stats, engine.board, engine.ticks
+        self.pieces.append((self.game, engine.seed, stats.pieces + 1, ticks, ticks - self.spawned,
+                            ShapeIndex[piece.shape], piece.rotation, piece.x, piece.y, cleared,
+                            board.height - min(board.tops), stats.level))
+        self.spawned = ticks
+        if len(self.pieces) >= self.batch:
+            self.writer.put('piece', self.pieces)
+            self.pieces = []
+
+    def on_level_up(self, engine):
+        self.levels.append(engine.ticks)
+
+    def on_game_over(self, engine):
+        self.summarize(engine, True)
+
+    # Summarize the game in play, if it hasn't ended
+    def finish(self, engine):
+        if self.playing:
+            self.summarize(engine, False)
+
+    def summarize(self, engine, ended):
+        stats, ticks = engine.stats, engine.ticks
+        seconds = ticks / float(TickRate)
+        self.games.append((self.game, engine.seed, ticks, seconds, stats.pieces, stats.score,
+                           stats.lines, stats.level, stats.pieces / seconds if ticks else 0.0,
+                           engine.inputs * 60 / seconds if ticks else 0.0, self.levels, ended))
+        self.playing = False
+        if len(self.games) >= self.batch:
+            self.writer.put('game', self.games)
+            self.games = []
+
+    # Hand everything recorded so far to the writer
+    def flush(self):
+        if self.pieces:
+            self.writer.put('piece', self.pieces)
+            self.pieces = []
+        if self.games:
+            self.writer.put('game', self.games)
+            self.games = []
+
+    def close(self):
+        self.flush()
+        self.writer.close()
@@ -0,0 +1,32 @@
+import pygame
+from collections import OrderedDict
+
+# Font face used for all game text
+FontName = "OCR A Extended"
+
+# Maximum number of rendered labels kept around
+Capacity = 64
+
+# Loaded fonts keyed by (size, bold), and rendered labels keyed by
+# (text, size, color, bold) in least recently used order
+fonts = {}
+labels = OrderedDict()
+
+# Get a font, searching the system fonts only the first time a size is used
+def font(size, bold=False):
+    key = (size, bold)
+    loaded = fonts.get(key)
+    if loaded is None:
+        loaded = fonts[key] = pygame.font.SysFont(FontName, size, bold)
+    return loaded
+
+# Render a text label, reusing the surface if it was rendered recently
+def render(text, size, color, bold=False):
+    key = (text, size, color, bold)
+    label = labels.pop(key, None)
+    if label is None:
+        label = font(size, bold).render(text, 1, color)
+        if len(labels) >= Capacity:
+            labels.popitem(last=False)
+    labels[key] = label
+    return label
@@ -1,7 +1,9 @@
 ScreenSize = (480, 450)
 
 class Point(object):
-    
+
+    __slots__ = ('x', 'y')
+
     def __init__(self, x=0, y=0):
         self.x = x
         self.y = y
@@ -18,7 +20,9 @@ class Point(object):
         return (self.x, self.y)
         
 class Dimension(object):
-    
+
+    __slots__ = ('width', 'height')
+
     def __init__(self, width, height):
         self.width = width
         self.height = height